@@ -1,3 +1,4 @@
+from functools import lru_cache
 from typing import Optional, Tuple
 
 from app.Code.benchmarks.category_map import normalize_amfi_category, sebi_category_label
@@ -9,13 +10,14 @@ def _has_any(text: str, *needles: str) -> bool:
     return any(needle in text for needle in needles)
 
 
+@lru_cache(maxsize=4096)
 def classify_sebi_category_from_name(
     scheme_name: str,
     scheme_type: str = "",
 ) -> Tuple[str, bool]:
     """
     Fallback classifier when AMFI scheme master has no entry.
-    Returns (sebi_category, ambiguous).
+    Returns (sebi_category, ambiguous). Memoized: the keyword cascade only depends on its inputs.
     """
     name = (scheme_name or "").upper()
     typ = (scheme_type or "").upper()
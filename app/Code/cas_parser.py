@@ -1,12 +1,12 @@
 import io
 import datetime
 import re
+import tempfile
 from decimal import Decimal
 from enum import Enum
-from contextlib import suppress
-from typing import Dict, Any, Optional, Union
+from typing import IO, Dict, Any, Optional, Union
 
-from openpyxl import Workbook
+import xlsxwriter
 
 from app.Code.pdfminer_hardening import harden_pdfminer_cmap_loading
 
@@ -16,6 +16,18 @@ harden_pdfminer_cmap_loading()
 from casparser import read_cas_pdf
 
 DANGEROUS_SPREADSHEET_PREFIX = re.compile(r"^[\t\r\n]|^\s*[=+\-@]")
+PASSWORD_ERROR_PATTERN = re.compile(
+    r"password|encrypted|decrypt|invalid credential|wrong password|incorrect password|pdfminer"
+    r"|file has not been decrypted|owner password",
+    re.IGNORECASE,
+)
+# Exports larger than this spill from memory to a temp file while being built and streamed.
+EXCEL_SPOOL_MAX_BYTES = 8 * 1024 * 1024
+TRANSACTION_EXCEL_HEADERS = (
+    "AMC", "Folio", "Scheme", "Advisor", "Date", "Description",
+    "Amount", "Units", "NAV", "Balance", "Type",
+)
+TRANSACTION_EXCEL_FIELDS = ("date", "description", "amount", "units", "nav", "balance", "type")
 
 
 def _excel_safe_cell(value):
@@ -25,42 +37,81 @@ def _excel_safe_cell(value):
         return f"'{value}"
     return value
 
+_JSON_CONTAINER_OR_SCALAR_TYPES = (
+    dict, list, tuple, set, str, int, float, bool, type(None), Decimal, datetime.date,
+)
+
+
+def _unwrap_parser_value(obj):
+    """Resolve enums and model-like objects until a container or scalar remains."""
+    while True:
+        if isinstance(obj, Enum):
+            obj = obj.value
+            continue
+        if isinstance(obj, _JSON_CONTAINER_OR_SCALAR_TYPES):
+            return obj
+
+        model_dump = getattr(obj, "model_dump", None)
+        if callable(model_dump):
+            try:
+                obj = model_dump(mode="json", by_alias=True)
+            except TypeError:
+                obj = model_dump(by_alias=True)
+            continue
+
+        to_dict = getattr(obj, "to_dict", None)
+        if callable(to_dict):
+            obj = to_dict()
+            continue
+
+        attrs = getattr(obj, "__dict__", None)
+        if attrs is not None:
+            obj = {k: v for k, v in attrs.items() if not k.startswith('_')}
+            continue
+        return obj
+
+
 def recursive_to_dict(obj):
-    if isinstance(obj, Decimal):
-        return str(obj)
-    if isinstance(obj, Enum):
-        return recursive_to_dict(obj.value)
-    if isinstance(obj, (datetime.date, datetime.datetime)):
-        return obj.isoformat()
-    if isinstance(obj, dict):
-        return {k: recursive_to_dict(v) for k, v in obj.items()}
-    if isinstance(obj, (list, tuple, set)):
-        return [recursive_to_dict(x) for x in obj]
-
-    model_dump = getattr(obj, "model_dump", None)
+    """Convert casparser output into JSON-safe primitives using an explicit worklist."""
+    root = [None]
+    stack = [(root, 0, obj)]
+    while stack:
+        parent, key, value = stack.pop()
+        value = _unwrap_parser_value(value)
+        if isinstance(value, Decimal):
+            parent[key] = str(value)
+        elif isinstance(value, datetime.date):
+            parent[key] = value.isoformat()
+        elif isinstance(value, dict):
+            out = {}
+            parent[key] = out
+            for k, v in value.items():
+                out[k] = None
+                stack.append((out, k, v))
+        elif isinstance(value, (list, tuple, set)):
+            items = [None] * len(value)
+            parent[key] = items
+            stack.extend((items, idx, v) for idx, v in enumerate(value))
+        else:
+            parent[key] = value
+    return root[0]
+
+
+def _parser_output_to_dict(data):
+    """Dump casparser's pydantic result in one call; walk the tree only for other shapes."""
+    model_dump = getattr(data, "model_dump", None)
     if callable(model_dump):
         try:
-            return recursive_to_dict(model_dump(mode="json", by_alias=True))
-        except TypeError:
-            return recursive_to_dict(model_dump(by_alias=True))
-
-    to_dict = getattr(obj, "to_dict", None)
-    if callable(to_dict):
-        return recursive_to_dict(to_dict())
-
-    if hasattr(obj, "__dict__"):
-        return recursive_to_dict({k: v for k, v in obj.__dict__.items() if not k.startswith('_')})
-    return obj
+            # JSON mode already emits enum values, ISO dates and Decimal strings.
+            return model_dump(mode="json", by_alias=True)
+        except (TypeError, ValueError):
+            pass
+    return recursive_to_dict(data)
 
 
 def _is_password_error(err_str: str) -> bool:
     """Check if an exception message looks like a password-related failure."""
-    lower = err_str.lower()
-    return any(kw in lower for kw in [
-        "password", "encrypted", "decrypt", "invalid credential",
-        "wrong password", "incorrect password", "pdfminer",
-        "file has not been decrypted", "owner password",
-    ])
+    return PASSWORD_ERROR_PATTERN.search(err_str) is not None
 
 
 def _safe_parse_error(message: str) -> str:
@@ -71,70 +122,45 @@ def _safe_parse_error(message: str) -> str:
         return "PDF parsing timed out. Please try again with a smaller file."
     return "Unable to parse the provided PDF file."
 
-def parse_with_casparser(pdf_path_or_buffer: Union[str, io.BytesIO], password: Optional[str] = None) -> Dict[str, Any]:
+def parse_with_casparser(
+    pdf_path_or_buffer: Union[str, bytes, io.BytesIO],
+    password: Optional[str] = None,
+) -> Dict[str, Any]:
     """
     Parses a CAS PDF file using casparser library.
     Handles password-protected PDFs gracefully.
+    Buffers are handed to casparser directly; no temp file is written.
     """
     harden_pdfminer_cmap_loading()
 
-    import tempfile
-    import os
-
     pdf_password = password or ""
-    tmp_path = None
-    try:
-        if not hasattr(pdf_path_or_buffer, "read"):
-            try:
-                data = read_cas_pdf(pdf_path_or_buffer, password=pdf_password)
-                return {"success": True, "data": recursive_to_dict(data)}
-            except Exception as e:
-                if _is_password_error(str(e)):
-                    if not pdf_password:
-                        return {"success": False, "error": "This PDF is password-protected. Please enter the password (usually your PAN, e.g. ABCDE1234F)."}
-                    return {"success": False, "error": "Incorrect password. CAS PDFs are usually protected with your PAN (e.g. ABCDE1234F). Please try again."}
-                return {"success": False, "error": _safe_parse_error(str(e))}
-
-        # Write buffer to a temp file (casparser needs a file path)
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp:
-            tmp.write(pdf_path_or_buffer.read())
-            tmp_path = tmp.name
-
-        # Parse the temp file
-        try:
-            data = read_cas_pdf(tmp_path, password=pdf_password)
-            data = recursive_to_dict(data)
-            return {"success": True, "data": data}
-        except Exception as e:
-            err_msg = str(e)
-            if _is_password_error(err_msg):
-                if not pdf_password:
-                    return {"success": False, "error": "This PDF is password-protected. Please enter the password (usually your PAN, e.g. ABCDE1234F)."}
-                return {"success": False, "error": "Incorrect password. CAS PDFs are usually protected with your PAN (e.g. ABCDE1234F). Please try again."}
-            if pdf_password:
-                return {"success": False, "error": "Failed to parse PDF. Please verify your password and file integrity."}
-            return {"success": False, "error": _safe_parse_error(err_msg)}
+    if isinstance(pdf_path_or_buffer, (bytes, bytearray)):
+        pdf_path_or_buffer = io.BytesIO(pdf_path_or_buffer)
+    is_buffer = hasattr(pdf_path_or_buffer, "read")
 
+    try:
+        data = read_cas_pdf(pdf_path_or_buffer, password=pdf_password)
+        return {"success": True, "data": _parser_output_to_dict(data)}
     except Exception as e:
-        return {"success": False, "error": _safe_parse_error(str(e))}
-    finally:
-        if tmp_path and os.path.exists(tmp_path):
-            with suppress(OSError):
-                os.remove(tmp_path)
-
-def convert_to_excel(json_data: Dict[str, Any]) -> io.BytesIO:
-    """
-    Converts parsed JSON data to an Excel file buffer (openpyxl only, no pandas).
-    """
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Transactions"
-
-    headers = [
-        "AMC", "Folio", "Scheme", "Advisor", "Date", "Description",
-        "Amount", "Units", "NAV", "Balance", "Type"
-    ]
-    ws.append(headers)
+        err_msg = str(e)
+        if _is_password_error(err_msg):
+            if not pdf_password:
+                return {"success": False, "error": "This PDF is password-protected. Please enter the password (usually your PAN, e.g. ABCDE1234F)."}
+            return {"success": False, "error": "Incorrect password. CAS PDFs are usually protected with your PAN (e.g. ABCDE1234F). Please try again."}
+        if is_buffer and pdf_password:
+            return {"success": False, "error": "Failed to parse PDF. Please verify your password and file integrity."}
+        return {"success": False, "error": _safe_parse_error(err_msg)}
+
+def _write_transactions_workbook(output: IO[bytes], json_data: Dict[str, Any]) -> None:
+    wb = xlsxwriter.Workbook(
+        output,
+        {"constant_memory": True, "strings_to_formulas": False, "strings_to_urls": False},
+    )
+    ws = wb.add_worksheet("Transactions")
+
+    write_row = ws.write_row
+    write_row(0, 0, TRANSACTION_EXCEL_HEADERS)
+    row_idx = 1
 
     folios = json_data.get("folios", []) if isinstance(json_data, dict) else []
     if not isinstance(folios, list):
@@ -152,6 +178,13 @@ def convert_to_excel(json_data: Dict[str, Any]) -> io.BytesIO:
             folio_num = folio_data.get("folio", scheme.get("folio", "Unknown"))
             advisor = scheme.get("advisor", "")
             amc = folio_data.get("amc", scheme.get("amc", ""))
+            # Scheme-level columns are identical for every transaction row.
+            prefix = (
+                _excel_safe_cell(amc),
+                _excel_safe_cell(folio_num),
+                _excel_safe_cell(scheme_name),
+                _excel_safe_cell(advisor),
+            )
 
             transactions = scheme.get("transactions", [])
             if not isinstance(transactions, list):
@@ -159,25 +192,35 @@ def convert_to_excel(json_data: Dict[str, Any]) -> io.BytesIO:
             for txn in transactions:
                 if not isinstance(txn, dict):
                     continue
-                row = [
-                    _excel_safe_cell(amc),
-                    _excel_safe_cell(folio_num),
-                    _excel_safe_cell(scheme_name),
-                    _excel_safe_cell(advisor),
-                    _excel_safe_cell(txn.get("date")),
-                    _excel_safe_cell(txn.get("description")),
-                    txn.get("amount"),
-                    txn.get("units"),
-                    txn.get("nav"),
-                    txn.get("balance"),
-                    _excel_safe_cell(txn.get("type")),
-                ]
-                ws.append(row)
-
-    if ws.max_row == 1:
-        ws.append(["No transactions found"])
-
-    output = io.BytesIO()
-    wb.save(output)
+                date, description, amount, units, nav, balance, txn_type = map(txn.get, TRANSACTION_EXCEL_FIELDS)
+                write_row(row_idx, 0, prefix + (
+                    _excel_safe_cell(date),
+                    _excel_safe_cell(description),
+                    amount,
+                    units,
+                    nav,
+                    balance,
+                    _excel_safe_cell(txn_type),
+                ))
+                row_idx += 1
+
+    if row_idx == 1:
+        write_row(row_idx, 0, ("No transactions found",))
+
+    wb.close()
+
+
+def convert_to_excel(json_data: Dict[str, Any]) -> IO[bytes]:
+    """
+    Converts parsed JSON data to an Excel file buffer (xlsxwriter only, no pandas).
+    Uses constant_memory mode so each row is flushed as soon as it is written.
+    The buffer is a SpooledTemporaryFile; callers should close it once streamed.
+    """
+    output = tempfile.SpooledTemporaryFile(max_size=EXCEL_SPOOL_MAX_BYTES, suffix=".xlsx")
+    try:
+        _write_transactions_workbook(output, json_data)
+    except BaseException:
+        output.close()
+        raise
     output.seek(0)
     return output
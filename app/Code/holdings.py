@@ -4,39 +4,115 @@ Option A: External API via HOLDINGS_API_URL.
 Option B: AMFI portfolio disclosure (Excel, best effort).
 Option C: Groww scheme page server-side payload (real constituent holdings).
 """
+import io
 import os
 import re
+import sys
 import asyncio
 import math
+import tempfile
+import time
+from collections import defaultdict
+from functools import lru_cache
+from operator import itemgetter
 from datetime import datetime, timezone
 from pathlib import Path
-from typing import Dict, List, Optional, Tuple, Any
+from typing import Dict, List, Optional, Set, Tuple, Any
+from urllib.parse import quote
 
 import httpx
+import orjson
 
-import json
+from app.Code.utils import get_debug_logger
 
 # In-memory cache: (year, month) -> Dict[scheme_key, List[(instrument, weight_pct)]]
 _amfi_cache: Dict[Tuple[int, int], Dict[str, List[Tuple[str, float]]]] = {}
+# "YYYY-MM" -> months from an old single-file cache that could not be moved to their own file yet.
+_amfi_legacy_months: Dict[str, Any] = {}
 # Session-level cache for URLs that previously failed
 _failed_urls = set()
 _groww_scheme_cache: Dict[str, str] = {}
-_groww_holdings_cache: Dict[str, List[Tuple[str, float]]] = {}
+# scheme code -> (fetched_at epoch seconds, holdings); persisted and reused until GROWW_HOLDINGS_TTL_SECONDS.
+_groww_holdings_cache: Dict[str, Tuple[float, List[Tuple[str, float]]]] = {}
 _groww_index_by_code: Dict[str, Dict[str, Any]] = {}
 _groww_index_entries: List[Dict[str, Any]] = []
 _groww_index_loaded = False
 _groww_index_lock = asyncio.Lock()
+# Candidate index for the Groww entries list currently in use: (source list, token -> positions, code -> first position).
+_groww_token_index: Optional[Tuple[List[Dict[str, Any]], Dict[str, List[int]], Dict[str, int]]] = None
+_http_client: Optional[httpx.AsyncClient] = None
+_http_client_loop: Optional[asyncio.AbstractEventLoop] = None
+# One pending task per client; holding them here keeps them from being garbage-collected.
+_http_client_guards: Set["asyncio.Task[None]"] = set()
+_amfi_cache_save_lock = asyncio.Lock()
+_amfi_cache_save_pending = False
+# Set whenever the persisted bookkeeping (failed URLs, Groww slugs/holdings) changes.
+_amfi_cache_dirty = False
+# Token index for the AMFI disclosure currently in use: (source dict, key order, token -> keys).
+_amfi_token_index: Optional[Tuple[Dict[str, Any], Dict[str, int], Dict[str, List[str]]]] = None
 AMFI_CACHE_FILE = "data/amfi_cache.json"
+AMFI_DOWNLOAD_CHUNK_BYTES = 64 * 1024
+# Groww refreshes holdings with the monthly disclosures.
+GROWW_HOLDINGS_TTL_SECONDS = 28 * 24 * 60 * 60
+# Groww requests ride on the shared client; these are applied per request.
+GROWW_REQUEST_HEADERS = {
+    "user-agent": "Mozilla/5.0",
+    "accept": "application/json,text/html,application/xhtml+xml",
+}
+GROWW_REQUEST_TIMEOUT = httpx.Timeout(4.0, connect=2.0)
+# Cap in-flight scheme page fetches so large portfolios do not trip Groww rate limits.
+GROWW_MAX_CONCURRENCY = 8
+# Per-code holdings API calls share the 20-connection client pool with Groww; stay below it so
+# queued requests do not spend their 2s timeout waiting for a connection.
+HOLDINGS_API_MAX_CONCURRENCY = 10
+# One pass per header cell; the group name says which column the cell labels.
+AMFI_HEADER_PATTERN = re.compile(
+    r"(?P<scheme>SCHEME|FUND\s*NAME)"
+    r"|(?P<inst>INSTRUMENT|SECURITY|STOCK|COMPANY)"
+    r"|(?P<weight>WEIGHT|%|ALLOCATION|PERCENT)"
+)
+MATCH_NON_ALNUM_PATTERN = re.compile(r"[^A-Z0-9]+")
+MATCH_TOKEN_PATTERN = re.compile(r"\S+")
+MATCH_STOP_WORDS = frozenset(
+    {
+        "DIRECT",
+        "REGULAR",
+        "PLAN",
+        "GROWTH",
+        "OPTION",
+        "FUND",
+        "OPEN",
+        "ENDED",
+        "SCHEME",
+        "IDCW",
+        "DIVIDEND",
+        "REINVESTMENT",
+    }
+)
+NEXT_DATA_SCRIPT_OPEN = '<script id="__NEXT_DATA__"'
+NEXT_DATA_SCRIPT_CLOSE = "</script>"
+GROWW_PAGE_CHUNK_CHARS = 16 * 1024
+
+
+def _default_amfi_monthly_cache_dir() -> str:
+    if os.environ.get("VERCEL"):
+        return str(Path(tempfile.gettempdir()) / "echo_analyze" / "amfi_monthly")
+    return "data/amfi_monthly"
+
+
+# Per-month parsed AMFI disclosures, shared across workers and restarts.
+AMFI_MONTHLY_CACHE_DIR = Path(os.environ.get("AMFI_CACHE_DIR", _default_amfi_monthly_cache_dir()))
 DEBUG_LOG_ENABLED = os.environ.get("ENABLE_DEBUG_LOGS", "").strip().lower() in {"1", "true", "yes"}
 
 def _load_amfi_cache():
-    global _amfi_cache, _failed_urls, _groww_scheme_cache, _groww_holdings_cache
+    global _amfi_cache, _amfi_legacy_months, _failed_urls, _groww_scheme_cache, _groww_holdings_cache
     if os.path.exists(AMFI_CACHE_FILE):
         try:
-            with open(AMFI_CACHE_FILE, "r", encoding="utf-8") as f:
-                data = json.load(f)
+            with open(AMFI_CACHE_FILE, "rb") as f:
+                data = orjson.loads(f.read())
                 # JSON keys are "YYYY-MM"; parse safely (never use eval on file input).
                 parsed_cache: Dict[Tuple[int, int], Dict[str, List[Tuple[str, float]]]] = {}
+                unmigrated: Dict[str, Any] = {}
                 for key, value in data.get("cache", {}).items():
                     if not isinstance(key, str):
                         continue
@@ -49,7 +125,13 @@ def _load_amfi_cache():
                     except ValueError:
                         continue
                     parsed_cache[(year, month)] = value
+                    # Snapshots no longer carry parsed months; move each one to its per-month file
+                    # first, and keep any that could not be written so the next save does not drop them.
+                    if isinstance(value, dict) and not _amfi_monthly_cache_path((year, month)).exists():
+                        if not _save_amfi_month_to_disk((year, month), value):
+                            unmigrated[key] = value
                 _amfi_cache = parsed_cache
+                _amfi_legacy_months = unmigrated
                 _failed_urls = set(data.get("failed", []))
                 raw_scheme_cache = data.get("groww_scheme_cache", {})
                 if isinstance(raw_scheme_cache, dict):
@@ -58,50 +140,200 @@ def _load_amfi_cache():
                         for k, v in raw_scheme_cache.items()
                         if isinstance(k, str) and isinstance(v, str)
                     }
-                # Always rebuild holdings from live source in each runtime.
-                _groww_holdings_cache = {}
+                _groww_holdings_cache = _parse_groww_holdings_cache(data.get("groww_holdings", {}))
         except Exception:
             return
 
+
+def _parse_groww_holdings_cache(raw: Any) -> Dict[str, Tuple[float, List[Tuple[str, float]]]]:
+    """Keep persisted Groww holdings that are well-formed and still within the TTL."""
+    if not isinstance(raw, dict):
+        return {}
+    now = time.time()
+    parsed: Dict[str, Tuple[float, List[Tuple[str, float]]]] = {}
+    for code, entry in raw.items():
+        if not isinstance(code, str) or not isinstance(entry, dict):
+            continue
+        fetched_at = entry.get("ts")
+        rows = entry.get("rows")
+        if not isinstance(fetched_at, (int, float)) or not isinstance(rows, list):
+            continue
+        if now - fetched_at >= GROWW_HOLDINGS_TTL_SECONDS:
+            continue
+        holdings = [
+            (str(row[0]), _parse_weight(row[1]))
+            for row in rows
+            if isinstance(row, list) and len(row) == 2 and isinstance(row[0], str)
+        ]
+        if holdings:
+            parsed[code] = (float(fetched_at), holdings)
+    return parsed
+
+
+def _write_amfi_cache_file(payload: Dict[str, Any]) -> None:
+    cache_path = Path(AMFI_CACHE_FILE)
+    cache_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = cache_path.with_name(f"{cache_path.name}.tmp")
+    tmp_path.write_bytes(orjson.dumps(payload))
+    os.replace(tmp_path, cache_path)
+
+
 async def save_amfi_cache_async():
-    """Save AMFI cache to disk without blocking the event loop."""
+    """Save AMFI cache to disk without blocking the event loop.
+    Skipped when nothing changed since the last snapshot; saves requested while a write
+    is in flight are coalesced into one follow-up write.
+    """
+    global _amfi_cache_save_pending, _amfi_cache_dirty
+    if os.environ.get("VERCEL"):
+        return
+    if not _amfi_cache_dirty:
+        return
+    if _amfi_cache_save_lock.locked():
+        _amfi_cache_save_pending = True
+        return
+    async with _amfi_cache_save_lock:
+        while True:
+            _amfi_cache_save_pending = False
+            _amfi_cache_dirty = False
+            # Snapshot on the loop thread; the worker thread must not see the dicts change mid-dump.
+            # Parsed months already live in their own files under AMFI_MONTHLY_CACHE_DIR, so only the
+            # small bookkeeping state is rewritten here; older files with a "cache" section still load.
+            payload = {
+                "failed": list(_failed_urls),
+                "groww_scheme_cache": dict(_groww_scheme_cache),
+                "groww_holdings": {
+                    code: {"rows": rows, "ts": fetched_at}
+                    for code, (fetched_at, rows) in _groww_holdings_cache.items()
+                },
+            }
+            if _amfi_legacy_months:
+                payload["cache"] = dict(_amfi_legacy_months)
+            try:
+                await asyncio.to_thread(_write_amfi_cache_file, payload)
+            except Exception as e:
+                _amfi_cache_dirty = True
+                log_holdings(f"Could not persist AMFI cache: {type(e).__name__}")
+                return
+            if not _amfi_cache_save_pending:
+                return
+
+
+def _amfi_monthly_cache_path(cache_key: Tuple[int, int]) -> Path:
+    return AMFI_MONTHLY_CACHE_DIR / f"{cache_key[0]:04d}_{cache_key[1]:02d}.json"
+
+
+def _load_amfi_month_from_disk(cache_key: Tuple[int, int]) -> Dict[str, List[Tuple[str, float]]]:
     try:
-        if os.environ.get("VERCEL"):
-            return
-        # Simple synchronous write - no threading needed
-        cache_str_keys = {f"{k[0]:04d}-{k[1]:02d}": v for k, v in _amfi_cache.items()}
-        cache_path = Path(AMFI_CACHE_FILE)
+        with open(_amfi_monthly_cache_path(cache_key), "rb") as f:
+            data = orjson.loads(f.read())
+    except (OSError, ValueError):
+        return {}
+    if not isinstance(data, dict):
+        return {}
+    parsed: Dict[str, List[Tuple[str, float]]] = {}
+    for key, rows in data.items():
+        if not isinstance(key, str) or not isinstance(rows, list):
+            continue
+        parsed[key] = [
+            (sys.intern(row[0]), _parse_weight(row[1]))
+            for row in rows
+            if isinstance(row, list) and len(row) == 2 and isinstance(row[0], str)
+        ]
+    return parsed
+
+
+def _save_amfi_month_to_disk(cache_key: Tuple[int, int], parsed: Dict[str, List[Tuple[str, float]]]) -> bool:
+    try:
+        cache_path = _amfi_monthly_cache_path(cache_key)
         cache_path.parent.mkdir(parents=True, exist_ok=True)
-        with open(cache_path, "w", encoding="utf-8") as f:
-            json.dump(
-                {
-                    "cache": cache_str_keys,
-                    "failed": list(_failed_urls),
-                    "groww_scheme_cache": _groww_scheme_cache,
-                },
-                f,
-            )
-    except Exception:
-        return
+        tmp_path = cache_path.with_suffix(".tmp")
+        with open(tmp_path, "wb") as f:
+            f.write(orjson.dumps(parsed))
+        os.replace(tmp_path, cache_path)
+    except Exception as e:
+        log_holdings(f"Could not persist AMFI month {cache_key}: {type(e).__name__}")
+        return False
+    return True
+
+
+async def _close_client_with_loop(client: httpx.AsyncClient) -> None:
+    """
+    Wait for the owning loop to shut down. asyncio.run (and uvicorn) cancel leftover tasks
+    before closing the loop, so the pool is closed while its sockets can still be awaited.
+    """
+    try:
+        await asyncio.get_running_loop().create_future()
+    finally:
+        await client.aclose()
+
+
+async def _get_client() -> httpx.AsyncClient:
+    global _http_client, _http_client_loop
+    loop = asyncio.get_running_loop()
+    # Pooled connections belong to the loop that opened them; start fresh on a new loop.
+    if _http_client is None or _http_client.is_closed or _http_client_loop is not loop:
+        stale, stale_loop = _http_client, _http_client_loop
+        if stale is not None and stale_loop is not None and stale_loop is not loop and stale_loop.is_running():
+            # Still serving another thread; close the old pool on its own loop.
+            asyncio.run_coroutine_threadsafe(stale.aclose(), stale_loop)
+        _http_client = httpx.AsyncClient(
+            http2=True,
+            timeout=httpx.Timeout(10.0, connect=2.0),
+            limits=httpx.Limits(max_connections=20, max_keepalive_connections=10),
+        )
+        _http_client_loop = loop
+        client = _http_client
+        guard = loop.create_task(_close_client_with_loop(client))
+        _http_client_guards.add(guard)
+        guard.add_done_callback(_http_client_guards.discard)
+        # Let the guard enter its try block; a task cancelled before its first step skips `finally`.
+        await asyncio.sleep(0)
+        return client
+    return _http_client
+
+
+async def close_http_client() -> None:
+    """Close the shared holdings client; called on app shutdown."""
+    global _http_client, _http_client_loop
+    client, _http_client = _http_client, None
+    _http_client_loop = None
+    if client is not None and not client.is_closed:
+        await client.aclose()
+    loop = asyncio.get_running_loop()
+    guards = [guard for guard in _http_client_guards if guard.get_loop() is loop]
+    for guard in guards:
+        guard.cancel()
+    await asyncio.gather(*guards, return_exceptions=True)
 
 
 def log_holdings(msg):
     if not DEBUG_LOG_ENABLED:
         return
-    try:
-        with open("data/backend_debug.log", "a") as f:
-            f.write(f"[{datetime.now()}] [Holdings] {msg}\n")
-    except Exception:
-        return
+    logger = get_debug_logger("echo_analyze.holdings")
+    if logger is not None:
+        logger.debug(f"[Holdings] {msg}")
 
 
 def _normalize_scheme_key(s: str) -> str:
     if not s or not isinstance(s, str):
         return ""
-    return " ".join(s.upper().strip().split())
+    return _normalize_scheme_text(s)
+
+
+@lru_cache(maxsize=8192)
+def _normalize_scheme_text(s: str) -> str:
+    # Disclosure sheets repeat the scheme name on every holding row.
+    # split() already drops leading/trailing whitespace and is ~5x faster than a regex sub here.
+    return " ".join(s.upper().split())
+
+
+WEIGHT_STRIP_CHARS = str.maketrans("", "", "%,")
 
 
 def _parse_weight(val) -> float:
+    # xlrd number cells arrive as plain floats; NaN and inf fail the range check.
+    if type(val) is float:
+        return val if -10_000 <= val <= 10_000 else 0.0
     if val is None:
         return 0.0
     if isinstance(val, bool):
@@ -109,7 +341,10 @@ def _parse_weight(val) -> float:
     if isinstance(val, (int, float)):
         parsed = float(val)
         return parsed if math.isfinite(parsed) and abs(parsed) <= 10_000 else 0.0
-    s = str(val).strip().replace("%", "").replace(",", "")
+    s = str(val).translate(WEIGHT_STRIP_CHARS).strip()
+    # Blank and text cells are the common non-numeric case; skip building a ValueError for them.
+    if not s or not (s[0].isdigit() or s[0] in "+-."):
+        return 0.0
     try:
         parsed = float(s)
     except ValueError:
@@ -120,33 +355,19 @@ def _parse_weight(val) -> float:
 _load_amfi_cache()
 
 
+# Scheme names repeat across the Groww index and every candidate pick; memoize the normalisation.
+@lru_cache(maxsize=4096)
 def _normalize_for_match(text: str) -> str:
     if not text:
         return ""
-    cleaned = re.sub(r"[^A-Z0-9]+", " ", str(text).upper()).strip()
+    cleaned = MATCH_NON_ALNUM_PATTERN.sub(" ", str(text).upper()).strip()
     if not cleaned:
         return ""
-    stop_words = {
-        "DIRECT",
-        "REGULAR",
-        "PLAN",
-        "GROWTH",
-        "OPTION",
-        "FUND",
-        "OPEN",
-        "ENDED",
-        "SCHEME",
-        "IDCW",
-        "DIVIDEND",
-        "REINVESTMENT",
-    }
-    tokens = [tok for tok in cleaned.split() if tok and tok not in stop_words]
+    tokens = [tok for tok in cleaned.split() if tok and tok not in MATCH_STOP_WORDS]
     return " ".join(tokens)
 
 
-def _jaccard_score(a: str, b: str) -> float:
-    set_a = set(a.split())
-    set_b = set(b.split())
+def _jaccard_score(set_a: frozenset, set_b: frozenset) -> float:
     if not set_a or not set_b:
         return 0.0
     inter = len(set_a & set_b)
@@ -165,10 +386,12 @@ async def _get_groww_index(client: httpx.AsyncClient) -> Tuple[Dict[str, Dict[st
 
         search_url = "https://groww.in/v1/api/search/v1/derived/scheme?query=mf&size=2000"
         try:
-            response = await client.get(search_url)
+            response = await client.get(
+                search_url, headers=GROWW_REQUEST_HEADERS, timeout=GROWW_REQUEST_TIMEOUT, follow_redirects=True
+            )
             if response.status_code != 200:
                 return {}, []
-            payload = response.json()
+            payload = orjson.loads(response.content)
             content = payload.get("content") if isinstance(payload, dict) else []
             entries: List[Dict[str, Any]] = []
             by_code: Dict[str, Dict[str, Any]] = {}
@@ -182,11 +405,15 @@ async def _get_groww_index(client: httpx.AsyncClient) -> Tuple[Dict[str, Dict[st
                     if not slug:
                         continue
                     normalized = _normalize_for_match(scheme_name)
+                    words = normalized.split()
+                    # Tokenised once here so candidate scoring is plain set arithmetic.
                     record = {
                         "id": slug,
                         "scheme_code": scheme_code,
                         "scheme_name": scheme_name,
                         "normalized_name": normalized,
+                        "tokens": frozenset(words),
+                        "first_token": words[0] if words else "",
                     }
                     entries.append(record)
                     if scheme_code:
@@ -199,6 +426,23 @@ async def _get_groww_index(client: httpx.AsyncClient) -> Tuple[Dict[str, Dict[st
             return {}, []
 
 
+def _get_groww_token_index(entries: List[Dict[str, Any]]) -> Tuple[Dict[str, List[int]], Dict[str, int]]:
+    """Return (token -> entry positions, scheme code -> first position), rebuilt only when entries changes."""
+    global _groww_token_index
+    if _groww_token_index is not None and _groww_token_index[0] is entries:
+        return _groww_token_index[1], _groww_token_index[2]
+    postings: Dict[str, List[int]] = {}
+    first_by_code: Dict[str, int] = {}
+    for pos, cand in enumerate(entries):
+        cand_code = str(cand.get("scheme_code") or "").strip()
+        if cand_code:
+            first_by_code.setdefault(cand_code, pos)
+        for token in cand.get("tokens") or ():
+            postings.setdefault(token, []).append(pos)
+    _groww_token_index = (entries, postings, first_by_code)
+    return postings, first_by_code
+
+
 def _pick_best_groww_candidate(
     entries: List[Dict[str, Any]],
     scheme_code: str,
@@ -210,26 +454,38 @@ def _pick_best_groww_candidate(
     best_score = 0.0
 
     target_words = target_name.split()
+    target_tokens = frozenset(target_words)
     target_first = target_words[0] if target_words else ""
 
-    for cand in entries:
-        cand_code = str(cand.get("scheme_code") or "").strip()
-        if code and cand_code and cand_code == code:
-            return cand
+    postings, first_by_code = _get_groww_token_index(entries)
+    if code and code in first_by_code:
+        return entries[first_by_code[code]]
 
+    # A candidate sharing no token with the target scores at most 0.8 - 0.15 (substring hit with a
+    # first-token mismatch), below the 0.7 bar, so only posting-list hits are scored, in index order.
+    positions = sorted({pos for token in target_tokens for pos in postings.get(token, ())})
+    for pos in positions:
+        cand = entries[pos]
         cand_norm = str(cand.get("normalized_name") or "")
         if not cand_norm or not target_name:
             continue
 
-        score = _jaccard_score(target_name, cand_norm)
+        cand_tokens = cand["tokens"]
+        cand_first = cand["first_token"]
+        first_token_match = bool(target_first and cand_first and target_first == cand_first)
+        if not first_token_match:
+            # Jaccard is at most min/max of the set sizes and a substring hit scores 0.8; after the
+            # mismatch penalty neither can reach the 0.7 acceptance bar unless the sizes are close.
+            sizes = sorted((len(target_tokens), len(cand_tokens)))
+            if not sizes[1] or sizes[0] / sizes[1] < 0.85:
+                continue
+
+        score = _jaccard_score(target_tokens, cand_tokens)
         if target_name == cand_norm:
             score = 1.0
         elif target_name in cand_norm or cand_norm in target_name:
             score = max(score, 0.8)
 
-        cand_words = cand_norm.split()
-        cand_first = cand_words[0] if cand_words else ""
-        first_token_match = bool(target_first and cand_first and target_first == cand_first)
         if not first_token_match:
             score -= 0.15
 
@@ -243,19 +499,42 @@ def _pick_best_groww_candidate(
 
 
 def _extract_next_data_json(page_html: str) -> Optional[dict]:
-    match = re.search(
-        r"<script id=\"__NEXT_DATA__\" type=\"application/json\"[^>]*>(.*?)</script>",
-        page_html,
-        flags=re.DOTALL | re.IGNORECASE,
-    )
-    if not match:
+    # Fixed delimiters: a literal scan avoids running a DOTALL regex over the whole page.
+    start = page_html.find(NEXT_DATA_SCRIPT_OPEN)
+    if start < 0:
+        return None
+    body_start = page_html.find(">", start)
+    if body_start < 0:
+        return None
+    body_end = page_html.find(NEXT_DATA_SCRIPT_CLOSE, body_start)
+    if body_end < 0:
         return None
     try:
-        return json.loads(match.group(1))
+        return orjson.loads(page_html[body_start + 1 : body_end])
     except Exception:
         return None
 
 
+async def _stream_next_data_json(response: httpx.Response) -> Optional[dict]:
+    """Read a scheme page only until its __NEXT_DATA__ script closes, then parse that payload."""
+    parts: List[str] = []
+    # Tail of the text seen so far, so a tag split across chunks is still found without rescanning.
+    tail = ""
+    async for chunk in response.aiter_text(GROWW_PAGE_CHUNK_CHARS):
+        window = tail + chunk
+        if not parts:
+            start = window.find(NEXT_DATA_SCRIPT_OPEN)
+            if start < 0:
+                tail = window[-(len(NEXT_DATA_SCRIPT_OPEN) - 1) :]
+                continue
+            chunk = window = window[start:]
+        parts.append(chunk)
+        if NEXT_DATA_SCRIPT_CLOSE in window:
+            break
+        tail = window[-(len(NEXT_DATA_SCRIPT_CLOSE) - 1) :]
+    return _extract_next_data_json("".join(parts)) if parts else None
+
+
 def _parse_groww_holdings(next_data: dict) -> List[Tuple[str, float]]:
     try:
         raw = (
@@ -269,7 +548,7 @@ def _parse_groww_holdings(next_data: dict) -> List[Tuple[str, float]]:
     if not isinstance(raw, list):
         return []
 
-    merged: Dict[str, float] = {}
+    merged: Dict[str, float] = defaultdict(float)
     for item in raw:
         if not isinstance(item, dict):
             continue
@@ -277,10 +556,17 @@ def _parse_groww_holdings(next_data: dict) -> List[Tuple[str, float]]:
         weight = _parse_weight(item.get("corpus_per"))
         if not name or weight <= 0:
             continue
-        merged[name] = merged.get(name, 0.0) + weight
+        merged[name] += weight
     if not merged:
         return []
-    return sorted(merged.items(), key=lambda x: x[1], reverse=True)
+    return sorted(merged.items(), key=itemgetter(1), reverse=True)
+
+
+def _remember_groww_slug(code: str, slug: str) -> None:
+    global _amfi_cache_dirty
+    if _groww_scheme_cache.get(code) != slug:
+        _groww_scheme_cache[code] = slug
+        _amfi_cache_dirty = True
 
 
 async def _fetch_holdings_from_groww(
@@ -288,11 +574,13 @@ async def _fetch_holdings_from_groww(
     scheme_name: str,
     client: httpx.AsyncClient,
 ) -> List[Tuple[str, float]]:
+    global _amfi_cache_dirty
     code = str(scheme_code or "").strip()
     if not code:
         return []
-    if code in _groww_holdings_cache:
-        return _groww_holdings_cache[code]
+    cached = _groww_holdings_cache.get(code)
+    if cached and time.time() - cached[0] < GROWW_HOLDINGS_TTL_SECONDS:
+        return cached[1]
 
     cached_slug = _groww_scheme_cache.get(code)
     slug = ""
@@ -305,47 +593,79 @@ async def _fetch_holdings_from_groww(
     if direct_match:
         slug = str(direct_match.get("id") or "").strip()
         if slug:
-            _groww_scheme_cache[code] = slug
+            _remember_groww_slug(code, slug)
 
     if not slug:
         picked = _pick_best_groww_candidate(entries, code, scheme_name)
         slug = str((picked or {}).get("id") or "").strip()
         if slug:
-            _groww_scheme_cache[code] = slug
+            _remember_groww_slug(code, slug)
         elif cached_slug:
             slug = cached_slug
         else:
             return []
 
-    page_url = f"https://groww.in/mutual-funds/{slug}"
+    # Slugs come from Groww's search payload; keep them to a single path segment.
+    page_url = f"https://groww.in/mutual-funds/{quote(slug, safe='')}"
     try:
-        page_resp = await client.get(page_url)
-        if page_resp.status_code != 200:
-            return []
-        next_data = _extract_next_data_json(page_resp.text)
+        async with client.stream(
+            "GET", page_url, headers=GROWW_REQUEST_HEADERS, timeout=GROWW_REQUEST_TIMEOUT, follow_redirects=True
+        ) as page_resp:
+            if page_resp.status_code != 200:
+                return []
+            next_data = await _stream_next_data_json(page_resp)
         if not next_data:
             return []
         rows = _parse_groww_holdings(next_data)
         if rows:
-            _groww_holdings_cache[code] = rows
+            _groww_holdings_cache[code] = (time.time(), rows)
+            _amfi_cache_dirty = True
             return rows
     except Exception:
         return []
     return []
 
 
+async def _post_holdings_api(client: httpx.AsyncClient, url: str, scheme_codes: List[str]) -> Any:
+    r = await client.post(url, json={"scheme_codes": scheme_codes}, timeout=2.0)
+    r.raise_for_status()
+    return orjson.loads(r.content)
+
+
 async def _fetch_holdings_from_api(scheme_codes: List[str]) -> Dict[str, List[Tuple[str, float]]]:
     """Option B: Call external API. Expects JSON { "<code>": [ {"name": "...", "weight_pct": 8.5}, ... ], ... }."""
     url = os.environ.get("HOLDINGS_API_URL", "").strip()
     if not url:
         return {}
     try:
-        async with httpx.AsyncClient(timeout=2.0) as client:
-            r = await client.post(url, json={"scheme_codes": scheme_codes})
-            r.raise_for_status()
-            data = r.json()
+        client = await _get_client()
+        if os.environ.get("HOLDINGS_API_MODE", "").strip().lower() == "per_code":
+            # Upstreams that serve one scheme per request: overlap the calls instead of batching.
+            api_slots = asyncio.Semaphore(HOLDINGS_API_MAX_CONCURRENCY)
+
+            async def _bounded_post(code: str) -> Any:
+                async with api_slots:
+                    return await _post_holdings_api(client, url, [code])
+
+            responses = await asyncio.gather(
+                *[_bounded_post(code) for code in scheme_codes],
+                return_exceptions=True,
+            )
+            data = {}
+            failed_codes = []
+            for code, resp in zip(scheme_codes, responses):
+                if isinstance(resp, dict):
+                    data.update(resp)
+                else:
+                    failed_codes.append(str(code))
+            if failed_codes:
+                log_holdings(f"Holdings API failed for {len(failed_codes)} code(s): {', '.join(failed_codes)}")
+        else:
+            data = await _post_holdings_api(client, url, scheme_codes)
     except Exception:
         return {}
+    if not isinstance(data, dict):
+        return {}
     out: Dict[str, List[Tuple[str, float]]] = {}
     for code, items in data.items():
         if not isinstance(items, list):
@@ -364,35 +684,38 @@ async def _fetch_holdings_from_api(scheme_codes: List[str]) -> Dict[str, List[Tu
     return out
 
 
+def _months_back(now: datetime, months: int) -> Tuple[int, int]:
+    """(year, month) that is `months` calendar months before now."""
+    index = now.year * 12 + now.month - 1 - months
+    return index // 12, index % 12 + 1
+
+
 async def _fetch_amfi_monthly_file() -> Dict[str, List[Tuple[str, float]]]:
     """
     Try to download and parse AMFI monthly portfolio disclosure.
-    Tries current and previous months in parallel.
+    Tries the current month first and only probes the previous month if that misses.
     Returns dict scheme_key -> [(instrument, weight_pct)]. Empty if no file found.
     """
     now = datetime.now(timezone.utc)
     month_names = "jan feb mar apr may jun jul aug sep oct nov dec".split()
+    target_keys = [_months_back(now, i) for i in range(2)]
     
     # Check cache first for any month
-    for i in range(2):
-        target_month = now.month - i
-        target_year = now.year
-        while target_month <= 0:
-            target_month += 12
-            target_year -= 1
-        cache_key = (target_year, target_month)
+    for cache_key in target_keys:
         if cache_key in _amfi_cache and _amfi_cache[cache_key]:
             return _amfi_cache[cache_key]
 
+    # Another worker (or an earlier run) may already have parsed this month.
+    for cache_key in target_keys:
+        from_disk = _load_amfi_month_from_disk(cache_key)
+        if from_disk:
+            log_holdings(f"Loaded {len(from_disk)} scheme rows for {cache_key} from disk cache")
+            _amfi_cache[cache_key] = from_disk
+            return from_disk
+
     urls_to_try = []
     keys_to_try = []
-    for i in range(2): 
-        target_month = now.month - i
-        target_year = now.year
-        while target_month <= 0:
-            target_month += 12
-            target_year -= 1
-            
+    for target_year, target_month in target_keys:
         month_str = month_names[target_month - 1]
         url = f"https://portal.amfiindia.com/spages/am{month_str}{target_year}repo.xls"
         if url not in _failed_urls:
@@ -403,41 +726,77 @@ async def _fetch_amfi_monthly_file() -> Dict[str, List[Tuple[str, float]]]:
         return {}
 
     async def _try_download(url, cache_key):
+        global _amfi_cache_dirty
         try:
-            async with httpx.AsyncClient(timeout=httpx.Timeout(2.0, connect=1.0), follow_redirects=True) as client:
-                r = await client.get(url)
-                if r.status_code == 200:
-                    log_holdings(f"Downloaded {url} (bytes={len(r.content)})")
-                    # Parsing is CPU bound, keep it simple for now or use run_in_executor
-                    result = _parse_amfi_excel(r.content, url)
-                    if result:
-                        log_holdings(f"Parsed {len(result)} scheme rows from {url}")
-                        _amfi_cache[cache_key] = result
-                        await save_amfi_cache_async()
-                        return result
-                    log_holdings(f"Parsed 0 rows from {url}; likely non-holdings workbook format")
-                    _amfi_cache[cache_key] = {}
-                    await save_amfi_cache_async()
-                elif r.status_code == 404:
-                    _failed_urls.add(url)
-                    _amfi_cache[cache_key] = {}
+            client = await _get_client()
+            async with client.stream(
+                "GET", url, timeout=httpx.Timeout(2.0, connect=1.0), follow_redirects=True
+            ) as r:
+                status_code = r.status_code
+                workbook_path = await _stream_amfi_workbook(r) if status_code == 200 else None
+            if workbook_path:
+                try:
+                    log_holdings(f"Downloaded {url} (bytes={os.path.getsize(workbook_path)})")
+                    # xlrd parsing is CPU bound; run it off the event loop so other requests keep flowing.
+                    result = await asyncio.to_thread(_parse_amfi_excel_file, workbook_path, url)
+                finally:
+                    os.unlink(workbook_path)
+                if result:
+                    log_holdings(f"Parsed {len(result)} scheme rows from {url}")
+                    _amfi_cache[cache_key] = result
+                    await asyncio.to_thread(_save_amfi_month_to_disk, cache_key, result)
                     await save_amfi_cache_async()
+                    return result
+                log_holdings(f"Parsed 0 rows from {url}; likely non-holdings workbook format")
+                _amfi_cache[cache_key] = {}
+                await save_amfi_cache_async()
+            elif status_code == 404:
+                _failed_urls.add(url)
+                _amfi_cache_dirty = True
+                _amfi_cache[cache_key] = {}
+                await save_amfi_cache_async()
         except Exception:
             log_holdings(f"Transient AMFI fetch failure for {url}; will retry later.")
         return None
 
-    results = await asyncio.gather(*[_try_download(u, k) for u, k in zip(urls_to_try, keys_to_try)])
-    
-    # Return first non-empty result
-    for res in results:
-        if res: return res
-        
+    # The newest month is the usual hit; only spend a second download when it is missing.
+    for url, cache_key in zip(urls_to_try, keys_to_try):
+        res = await _try_download(url, cache_key)
+        if res:
+            return res
+
     log_holdings("Failed to find any AMFI monthly report in recent months.")
     return {}
 
 
+async def _stream_amfi_workbook(response: httpx.Response) -> str:
+    """Write a disclosure download to a temp file chunk by chunk and return its path."""
+    fd, path = tempfile.mkstemp(suffix=".xls")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            async for chunk in response.aiter_bytes(AMFI_DOWNLOAD_CHUNK_BYTES):
+                f.write(chunk)
+    except BaseException:
+        os.unlink(path)
+        raise
+    return path
+
+
 def _parse_amfi_excel(content: bytes, url: str) -> Dict[str, List[Tuple[str, float]]]:
     """Parse .xls content. Look for columns: scheme/fund, instrument/security, weight/%. Return scheme_key -> [(inst, w)]."""
+    return _parse_amfi_workbook({"file_contents": content}, url)
+
+
+def _parse_amfi_excel_file(path: str, url: str) -> Dict[str, List[Tuple[str, float]]]:
+    """Same as _parse_amfi_excel, but reads the workbook from disk instead of a bytes copy."""
+    return _parse_amfi_workbook({"filename": path}, url)
+
+
+def _parse_amfi_workbook(source: Dict[str, Any], url: str) -> Dict[str, List[Tuple[str, float]]]:
+    parsed = _parse_amfi_workbook_calamine(source)
+    if parsed is not None:
+        return parsed
+
     try:
         import xlrd
     except ImportError:
@@ -445,78 +804,169 @@ def _parse_amfi_excel(content: bytes, url: str) -> Dict[str, List[Tuple[str, flo
         return {}
 
     try:
-        book = xlrd.open_workbook(file_contents=content)
+        # on_demand defers sheet loading so each sheet is parsed and released in turn.
+        book = xlrd.open_workbook(on_demand=True, **source)
     except Exception as e:
         log_holdings(f"xlrd failed to open workbook: {e}")
         return {}
 
     out: Dict[str, List[Tuple[str, float]]] = {}
-    
-    for sheet_idx in range(book.nsheets):
-        sheet = book.sheet_by_index(sheet_idx)
-        if sheet.nrows < 2:
+    try:
+        for sheet_idx in range(book.nsheets):
+            _collect_amfi_sheet_rows(book.sheet_by_index(sheet_idx), out)
+            book.unload_sheet(sheet_idx)
+    finally:
+        book.release_resources()
+    return out
+
+
+def _parse_amfi_workbook_calamine(source: Dict[str, Any]) -> Optional[Dict[str, List[Tuple[str, float]]]]:
+    """Parse with python-calamine (native reader). None means unavailable or failed; use xlrd instead."""
+    try:
+        from python_calamine import CalamineWorkbook
+    except ImportError:
+        return None
+
+    try:
+        if "filename" in source:
+            book = CalamineWorkbook.from_path(source["filename"])
+        else:
+            book = CalamineWorkbook.from_filelike(io.BytesIO(source["file_contents"]))
+        out: Dict[str, List[Tuple[str, float]]] = {}
+        for sheet_idx in range(len(book.sheet_names)):
+            rows = book.get_sheet_by_index(sheet_idx).to_python(skip_empty_area=False)
+            _collect_amfi_sheet_rows(_CalamineSheet(rows), out)
+        return out
+    except Exception as e:
+        log_holdings(f"calamine failed to read workbook ({type(e).__name__}); falling back to xlrd")
+        return None
+
+
+class _CalamineSheet:
+    """The slice of xlrd's Sheet API that _collect_amfi_sheet_rows reads, over calamine's row lists."""
+
+    def __init__(self, rows: List[List[Any]]):
+        self._rows = rows
+        self.nrows = len(rows)
+        self.ncols = max((len(row) for row in rows), default=0)
+
+    @staticmethod
+    def _as_xlrd_value(value: Any) -> Any:
+        # xlrd reports every .xls number as float and booleans as 0/1; calamine narrows whole
+        # numbers to int. Match xlrd so scheme keys and instrument names come out identical.
+        if type(value) is int:
+            return float(value)
+        if type(value) is bool:
+            return int(value)
+        return value
+
+    def row_values(self, row_idx: int) -> List[Any]:
+        return [self._as_xlrd_value(v) for v in self._rows[row_idx]]
+
+    def col_values(self, col_idx: int, start_rowx: int = 0) -> List[Any]:
+        as_xlrd = self._as_xlrd_value
+        return [as_xlrd(row[col_idx]) if col_idx < len(row) else "" for row in self._rows[start_rowx:]]
+
+
+def _collect_amfi_sheet_rows(sheet, out: Dict[str, List[Tuple[str, float]]]) -> None:
+    """Append (instrument, weight) rows from one disclosure sheet into out, keyed by scheme."""
+    if sheet.nrows < 2:
+        return
+
+    # Find header row
+    header_cols = {"scheme": -1, "inst": -1, "weight": -1}
+    for row_idx in range(min(20, sheet.nrows)):
+        for c, raw in enumerate(sheet.row_values(row_idx)):
+            # Header labels are text; numeric and blank cells can never match.
+            if not isinstance(raw, str) or not raw:
+                continue
+            for match in AMFI_HEADER_PATTERN.finditer(raw.upper()):
+                if header_cols[match.lastgroup] < 0:
+                    header_cols[match.lastgroup] = c
+        if header_cols["scheme"] >= 0 and header_cols["weight"] >= 0:
+            break
+    scheme_col = header_cols["scheme"]
+    inst_col = header_cols["inst"]
+    weight_col = header_cols["weight"]
+    if scheme_col < 0 or weight_col < 0:
+        return
+    if inst_col < 0:
+        inst_col = scheme_col + 1 if scheme_col + 1 < sheet.ncols else scheme_col
+
+    # Rows are padded to ncols unless ragged_rows is set, so whole-column reads are safe.
+    try:
+        scheme_vals = sheet.col_values(scheme_col, start_rowx=1)
+        inst_vals = sheet.col_values(inst_col, start_rowx=1)
+        weight_vals = sheet.col_values(weight_col, start_rowx=1)
+    except IndexError:
+        return
+
+    # Parse weights in bulk and filter on them first so blank, header and total rows skip the string work.
+    for raw_scheme, raw_inst, w_val in zip(scheme_vals, inst_vals, map(_parse_weight, weight_vals)):
+        if w_val <= 0:
             continue
-            
-        # Find header row
-        scheme_col = -1
-        inst_col = -1
-        weight_col = -1
-        for row_idx in range(min(20, sheet.nrows)):
-            row = sheet.row(row_idx)
-            for c, cell in enumerate(row):
-                val = str(cell.value or "").upper()
-                if re.search(r"SCHEME|FUND\s*NAME", val) and scheme_col < 0:
-                    scheme_col = c
-                if re.search(r"INSTRUMENT|SECURITY|STOCK|COMPANY", val) and inst_col < 0:
-                    inst_col = c
-                if re.search(r"WEIGHT|%|ALLOCATION|PERCENT", val) and weight_col < 0:
-                    weight_col = c
-            if scheme_col >= 0 and weight_col >= 0:
-                break
-        if scheme_col < 0 or weight_col < 0:
+        scheme_val = str(raw_scheme or "").strip()
+        if not scheme_val:
             continue
-        if inst_col < 0:
-            inst_col = scheme_col + 1 if scheme_col + 1 < sheet.ncols else scheme_col
-
-        for row_idx in range(1, sheet.nrows):
-            row = sheet.row(row_idx)
-            scheme_val = str(row[scheme_col].value or "").strip() if scheme_col < len(row) else ""
-            inst_val = str(row[inst_col].value or "").strip() if inst_col < len(row) else ""
-            w_val = _parse_weight(row[weight_col].value if weight_col < len(row) else None)
-            if not scheme_val or w_val <= 0:
-                continue
-            key = _normalize_scheme_key(scheme_val)
-            if not key:
-                continue
-            if key not in out:
-                out[key] = []
-            if inst_val:
-                out[key].append((inst_val, w_val))
-    return out
+        key = _normalize_scheme_key(scheme_val)
+        if not key:
+            continue
+        if key not in out:
+            out[key] = []
+        inst_val = str(raw_inst or "").strip()
+        if inst_val:
+            # The same instruments recur across hundreds of schemes; share one string object each.
+            out[key].append((sys.intern(inst_val), w_val))
 
 
-async def get_holdings_for_schemes(
-    scheme_codes: List[str],
-    scheme_names: Optional[Dict[str, str]] = None,
-) -> Dict[str, List[Tuple[str, float]]]:
-    """
-    Return holdings (instrument, weight_pct) per scheme.
-    scheme_codes: list of AMFI codes from CAS.
-    scheme_names: optional map scheme_code -> scheme_name for matching when Excel uses names.
-    """
-    if not scheme_codes:
-        return {}
+def _get_amfi_token_index(full: Dict[str, List[Tuple[str, float]]]) -> Tuple[Dict[str, int], Dict[str, List[str]]]:
+    """Return (key order, token -> keys) for full, rebuilt only when the disclosure dict changes."""
+    global _amfi_token_index
+    if _amfi_token_index is not None and _amfi_token_index[0] is full:
+        return _amfi_token_index[1], _amfi_token_index[2]
+    order: Dict[str, int] = {}
+    postings: Dict[str, List[str]] = {}
+    for pos, file_key in enumerate(full):
+        order[file_key] = pos
+        for token in set(file_key.split()):
+            postings.setdefault(token, []).append(file_key)
+    _amfi_token_index = (full, order, postings)
+    return order, postings
 
-    # Option B: external API (highest priority if configured)
-    result: Dict[str, List[Tuple[str, float]]] = {}
-    api_result = await _fetch_holdings_from_api(scheme_codes)
-    if api_result:
-        result.update(api_result)
 
-    # Option A: AMFI file (best-effort; format varies by month/report)
-    full = await _fetch_amfi_monthly_file()
+def _amfi_keys_containing(needle: str, postings: Dict[str, List[str]], all_keys) -> List[str]:
+    """Return AMFI keys that contain needle as a substring, using the token index to narrow the scan."""
+    spans = [(m.start(), m.end(), m.group()) for m in MATCH_TOKEN_PATTERN.finditer(needle)]
+    if not spans:
+        return [k for k in all_keys if needle in k]
+    # A token with whitespace on both sides must appear as a whole word in any matching key.
+    inner = [tok for start, end, tok in spans if start > 0 and end < len(needle)]
+    if inner:
+        candidates = min((postings.get(tok, []) for tok in inner), key=len)
+    else:
+        # Edge tokens may be cut mid-word, so match them against the token vocabulary instead.
+        edge = max(spans[0][2], spans[-1][2], key=len)
+        candidates = [k for token, keys in postings.items() if edge in token for k in keys]
+    return [k for k in candidates if needle in k]
+
 
-    # Map our scheme_codes (and names) to keys in full. Excel may use code or name.
+def _longest_amfi_key_prefix(norm_name: str, full: Dict[str, List[Tuple[str, float]]]) -> Optional[str]:
+    """Longest whole-word prefix of norm_name (two words or more) that is itself an AMFI key."""
+    words = norm_name.split(" ")
+    for end in range(len(words) - 1, 1, -1):
+        candidate = " ".join(words[:end])
+        if candidate in full:
+            return candidate
+    return None
+
+
+def _match_amfi_disclosure(
+    scheme_codes: List[str],
+    scheme_names: Optional[Dict[str, str]],
+    full: Dict[str, List[Tuple[str, float]]],
+    result: Dict[str, List[Tuple[str, float]]],
+) -> None:
+    """Map scheme_codes (and names) to keys in full, filling result. Excel may use code or name."""
     log_holdings(f"Attempting to match {len(scheme_codes)} schemes against {len(full)} cache entries.")
     
     for code in scheme_codes:
@@ -525,61 +975,99 @@ async def get_holdings_for_schemes(
             continue
         found = False
         
+        name_val = scheme_names.get(code_str) if scheme_names else None
+        norm_code = _normalize_scheme_key(code_str)
+        norm_name = _normalize_scheme_key(name_val) if name_val else None
+
         # Try by code
         if code_str in full:
             result[code_str] = full[code_str]
             found = True
-        elif _normalize_scheme_key(code_str) in full:
-            result[code_str] = full[_normalize_scheme_key(code_str)]
+        elif norm_code in full:
+            result[code_str] = full[norm_code]
             found = True
             
         # Try by name
-        if not found and scheme_names and code_str in scheme_names:
-            name_key = _normalize_scheme_key(scheme_names[code_str])
-            if name_key in full:
-                result[code_str] = full[name_key]
-                found = True
+        if not found and norm_name is not None and norm_name in full:
+            result[code_str] = full[norm_name]
+            found = True
         
         # Fuzzy: any key that contains code or normalized name
         if not found:
-            name_val = scheme_names.get(code_str) if scheme_names else None
-            norm_name = _normalize_scheme_key(name_val) if name_val else None
-            
-            for file_key, rows in full.items():
-                if code_str in file_key or (norm_name and norm_name in file_key):
-                    result[code_str] = rows
-                    found = True
-                    break
+            order, postings = _get_amfi_token_index(full)
+            matches = _amfi_keys_containing(code_str, postings, full)
+            if norm_name:
+                matches += _amfi_keys_containing(norm_name, postings, full)
+            if matches:
+                # Keep the first key in disclosure order, as the linear scan did.
+                result[code_str] = full[min(matches, key=order.__getitem__)]
+                found = True
+
+        # Prefix: disclosures often list the scheme without the plan/option suffix the CAS carries.
+        if not found and norm_name:
+            prefix_key = _longest_amfi_key_prefix(norm_name, full)
+            if prefix_key is not None:
+                result[code_str] = full[prefix_key]
+                found = True
         
         if not found:
             log_holdings(f"Failed to match scheme: Code={code_str}, Name={scheme_names.get(code_str) if scheme_names else 'N/A'}")
         else:
             log_holdings(f"Matched: {code_str}")
 
+
+async def get_holdings_for_schemes(
+    scheme_codes: List[str],
+    scheme_names: Optional[Dict[str, str]] = None,
+) -> Dict[str, List[Tuple[str, float]]]:
+    """
+    Return holdings (instrument, weight_pct) per scheme.
+    scheme_codes: list of AMFI codes from CAS.
+    scheme_names: optional map scheme_code -> scheme_name for matching when Excel uses names.
+    """
+    if not scheme_codes:
+        return {}
+
+    # Option B: external API (highest priority if configured)
+    result: Dict[str, List[Tuple[str, float]]] = {}
+    api_result = await _fetch_holdings_from_api(scheme_codes)
+    if api_result:
+        result.update(api_result)
+
+    # Option A: AMFI file (best-effort; format varies by month/report)
+    full = await _fetch_amfi_monthly_file()
+
+    if full:
+        _match_amfi_disclosure(scheme_codes, scheme_names, full, result)
+    else:
+        log_holdings("No AMFI disclosure available; skipping AMFI matching.")
+
     # Option C: Groww website server-side payload (real constituent holdings).
-    pending = [c for c in scheme_codes if str(c).strip() and str(c).strip() not in result]
+    # Duplicate codes share one fetch; results are keyed by the stripped code either way.
+    stripped_codes = (str(code).strip() for code in scheme_codes)
+    pending = list(dict.fromkeys(c for c in stripped_codes if c and c not in result))
     if pending:
-        headers = {
-            "user-agent": "Mozilla/5.0",
-            "accept": "application/json,text/html,application/xhtml+xml",
-        }
-        async with httpx.AsyncClient(timeout=httpx.Timeout(4.0, connect=2.0), follow_redirects=True, headers=headers) as client:
-            tasks = []
-            for code in pending:
-                code_str = str(code).strip()
-                name = (scheme_names or {}).get(code_str) or code_str
-                tasks.append(_fetch_holdings_from_groww(code_str, name, client))
-
-            fetched = await asyncio.gather(*tasks, return_exceptions=True)
-            for code, rows in zip(pending, fetched):
-                code_str = str(code).strip()
-                if isinstance(rows, Exception):
-                    log_holdings(f"Groww fetch exception for {code_str}: {type(rows).__name__}")
-                    continue
-                if rows:
-                    result[code_str] = rows
-                    log_holdings(f"Groww matched {code_str}: {len(rows)} holdings")
-                else:
-                    log_holdings(f"Groww no-match for {code_str}")
+        client = await _get_client()
+        groww_slots = asyncio.Semaphore(GROWW_MAX_CONCURRENCY)
+
+        async def _bounded_groww_fetch(code_str: str, name: str) -> List[Tuple[str, float]]:
+            async with groww_slots:
+                return await _fetch_holdings_from_groww(code_str, name, client)
+
+        tasks = []
+        for code_str in pending:
+            name = (scheme_names or {}).get(code_str) or code_str
+            tasks.append(_bounded_groww_fetch(code_str, name))
+
+        fetched = await asyncio.gather(*tasks, return_exceptions=True)
+        for code_str, rows in zip(pending, fetched):
+            if isinstance(rows, Exception):
+                log_holdings(f"Groww fetch exception for {code_str}: {type(rows).__name__}")
+                continue
+            if rows:
+                result[code_str] = rows
+                log_holdings(f"Groww matched {code_str}: {len(rows)} holdings")
+            else:
+                log_holdings(f"Groww no-match for {code_str}")
 
     return result
@@ -7,18 +7,22 @@ import os
 import re
 import uuid
 from bisect import bisect_right
+from collections import defaultdict
 from dataclasses import dataclass
 from datetime import date, datetime, timedelta
+from functools import lru_cache
 from pathlib import Path
 from time import monotonic, perf_counter
 from typing import Any, Dict, List, Literal, Optional, Set, Tuple, get_args
 
 import httpx
+import orjson
 from fastapi import FastAPI, File, Form, HTTPException, Query, Request, UploadFile
 from fastapi.encoders import jsonable_encoder
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import FileResponse, HTMLResponse, JSONResponse, Response, StreamingResponse
 from fastapi.staticfiles import StaticFiles
+from starlette.background import BackgroundTask
 from pydantic import BaseModel, Field
 
 from app.Code.analytics import get_admin_overview, record_analysis_run, record_audit_log
@@ -54,9 +58,9 @@ from app.Code.benchmarks.models import BenchmarkComponent
 from app.Code.benchmarks.amfi_enrichment import enrich_cas_amfi_codes
 from app.Code.benchmarks.resolver import resolve_benchmark
 from app.Code.benchmarks.tri_history import fetch_tri_index_history, tri_data_available
-from app.holdings import get_holdings_for_schemes, save_amfi_cache_async
+from app.holdings import close_http_client as close_holdings_http_client, get_holdings_for_schemes, save_amfi_cache_async
 from app.overlap import compute_overlap_matrix
-from app.utils import calculate_xirr, fetch_live_nav, fetch_nav_history, save_cache_async
+from app.utils import calculate_xirr, fetch_live_nav, fetch_nav_history, get_debug_logger, save_cache_async
 from app.Code.investment_events import InvestmentEvent, extract_investment_events
 from app.Code.advisor_clients import list_advisor_clients_for_user, upsert_advisor_client_for_user
 from app.Code.reviews import (
@@ -79,9 +83,15 @@ def _refresh_local_env_on_startup() -> None:
     load_local_env()
 
 
-LOG_FILE = "data/backend_debug.log"
+@app.on_event("shutdown")
+async def _close_shared_http_clients() -> None:
+    """Release pooled upstream connections when the worker stops."""
+    await close_holdings_http_client()
+
+
 MAX_UPLOAD_BYTES = 25 * 1024 * 1024
 UPLOAD_READ_CHUNK_BYTES = 1024 * 1024
+EXCEL_STREAM_CHUNK_BYTES = 64 * 1024
 MAX_WEBHOOK_BODY_BYTES = 256 * 1024
 MAX_CAS_FOLIOS = 100
 MAX_CAS_SCHEMES = 500
@@ -98,10 +108,19 @@ ALLOWED_CONTENT_TYPES = {
 }
 ALLOWED_PARSE_OUTPUT_FORMATS = {"json", "excel"}
 PDF_MAGIC_PREFIX = b"%PDF-"
+JSON_START_PREFIXES = (b"{", b"[", b"\xef\xbb\xbf{", b"\xef\xbb\xbf[")
+# Same byte set as bytes.lstrip(); locating the first content byte avoids copying the upload.
+UPLOAD_LEADING_CONTENT_PATTERN = re.compile(rb"[^ \t\n\r\x0b\x0c]")
 AMFI_CODE_PATTERN = re.compile(r"^\d{1,12}$")
 CURRENCY_TOKEN_PATTERN = re.compile(
     r"(?i)(?:\u20b9|(?<![A-Za-z])rs\.?(?![A-Za-z])|(?<![A-Za-z])inr(?![A-Za-z]))"
 )
+PII_PAN_PATTERN = re.compile(r"\b[A-Z]{5}[0-9]{4}[A-Z]\b", re.IGNORECASE)
+PII_EMAIL_PATTERN = re.compile(r"[\w\.-]+@[\w\.-]+\.\w+")
+PII_PHONE_PATTERN = re.compile(r"(?<![\d.])(?:\+?\d[\d\-\s]{8,}\d)(?![\d.])")
+BENCHMARK_AUTHORITATIVE_SOURCES = {"sebi_tier1", "underlying_index"}
+# Per-code NAV/history fetches in flight at once while pre-fetching an analysis.
+NAV_PREFETCH_MAX_CONCURRENCY = 16
 DEFAULT_PDF_PARSE_TIMEOUT_SECONDS = 120.0
 MAX_PDF_PARSE_TIMEOUT_SECONDS = 240.0
 PDF_PARSE_WORKER_JOIN_GRACE_SECONDS = 2.0
@@ -127,9 +146,10 @@ _demo_request_rate_limit: Dict[str, float] = {}
 def _redact_pii(text: str) -> str:
     if not text:
         return text
-    text = re.sub(r"\b[A-Z]{5}[0-9]{4}[A-Z]\b", "[REDACTED_PAN]", text, flags=re.IGNORECASE)
-    text = re.sub(r"[\w\.-]+@[\w\.-]+\.\w+", "[REDACTED_EMAIL]", text)
-    text = re.sub(r"(?<![\d.])(?:\+?\d[\d\-\s]{8,}\d)(?![\d.])", "[REDACTED_PHONE]", text)
+    # Applied in sequence on purpose: a PAN-shaped mailbox is redacted as a PAN, as before.
+    text = PII_PAN_PATTERN.sub("[REDACTED_PAN]", text)
+    text = PII_EMAIL_PATTERN.sub("[REDACTED_EMAIL]", text)
+    text = PII_PHONE_PATTERN.sub("[REDACTED_PHONE]", text)
     return text
 
 
@@ -139,9 +159,9 @@ def log_debug(msg: str) -> None:
     safe_msg = _redact_pii(str(msg))
     try:
         print(f"[DEBUG] {safe_msg}", flush=True)
-        if not os.environ.get("VERCEL"):
-            with open(LOG_FILE, "a") as f:
-                f.write(f"[{datetime.now()}] {safe_msg}\n")
+        logger = get_debug_logger("echo_analyze.main")
+        if logger is not None:
+            logger.debug(safe_msg)
     except Exception:
         return
 
@@ -199,29 +219,35 @@ async def add_response_security_headers(request: Request, call_next):
     return response
 
 
+INFER_EQUITY_FORCED_HINTS = ("ETF", "INDEX", "NIFTY", "SENSEX", "NASDAQ", "HANG SENG")
+INFER_DEBT_FORCED_HINTS = ("DEBT", "BOND", "GILT", "LIQUID", "OVERNIGHT", "MONEY MARKET", "CREDIT RISK")
+INFER_EQUITY_HINTS = (
+    "EQUITY", "ELSS", "INDEX", "ETF", "NIFTY", "SENSEX", "LARGE", "MID", "SMALL",
+    "FLEXI", "BLUECHIP", "FOCUSED", "VALUE", "CONTRA", "INTERNATIONAL", "OVERSEAS",
+    "NASDAQ", "HANG SENG"
+)
+INFER_DEBT_HINTS = (
+    "DEBT", "LIQUID", "OVERNIGHT", "MONEY MARKET", "GILT", "CORPORATE BOND",
+    "SHORT DURATION", "CREDIT RISK", "FIXED INCOME"
+)
+
+
+# Pure function of three short strings; the same schemes recur across folios and requests.
+@lru_cache(maxsize=1024)
 def _infer_category(scheme_name: str, scheme_type: str, sub_category: str) -> Tuple[str, bool]:
     name = (scheme_name or "").upper()
     typ = (scheme_type or "").upper()
     sub = (sub_category or "").upper()
-    equity_forced_hints = ["ETF", "INDEX", "NIFTY", "SENSEX", "NASDAQ", "HANG SENG"]
-    debt_forced_hints = ["DEBT", "BOND", "GILT", "LIQUID", "OVERNIGHT", "MONEY MARKET", "CREDIT RISK"]
-    equity_hints = [
-        "EQUITY", "ELSS", "INDEX", "ETF", "NIFTY", "SENSEX", "LARGE", "MID", "SMALL",
-        "FLEXI", "BLUECHIP", "FOCUSED", "VALUE", "CONTRA", "INTERNATIONAL", "OVERSEAS",
-        "NASDAQ", "HANG SENG"
-    ]
-    debt_hints = [
-        "DEBT", "LIQUID", "OVERNIGHT", "MONEY MARKET", "GILT", "CORPORATE BOND",
-        "SHORT DURATION", "CREDIT RISK", "FIXED INCOME"
-    ]
-    equity_signal = any(x in name for x in equity_hints) or "EQUITY" in typ
-    debt_signal = any(x in name for x in debt_hints) or "DEBT" in typ or "FIXED INCOME" in typ
+    name_has_equity_hint = any(x in name for x in INFER_EQUITY_HINTS)
+    name_has_debt_forced_hint = any(x in name for x in INFER_DEBT_FORCED_HINTS)
+    equity_signal = name_has_equity_hint or "EQUITY" in typ
+    debt_signal = any(x in name for x in INFER_DEBT_HINTS) or "DEBT" in typ or "FIXED INCOME" in typ
 
     # Prevent ETF/Index/FoF equity schemes from being misclassified when source types are noisy.
-    if any(x in name for x in equity_forced_hints) and not any(x in name for x in debt_forced_hints):
+    if any(x in name for x in INFER_EQUITY_FORCED_HINTS) and not name_has_debt_forced_hint:
         return "Equity", False
     if "FUND OF FUND" in typ or "FOF" in typ:
-        if any(x in name for x in equity_hints) and not any(x in name for x in debt_forced_hints):
+        if name_has_equity_hint and not name_has_debt_forced_hint:
             return "Equity", False
 
     if "EQUITY" in sub or "INDEX" in sub or "CAP" in sub or "ELSS" in sub:
@@ -244,17 +270,24 @@ def _parse_iso_date(value: Any) -> Optional[datetime]:
         return datetime.combine(value, datetime.min.time())
     if not isinstance(value, str):
         return None
-    text = value.strip()
+    return _parse_iso_date_text(value.strip())
+
+
+# Transaction dates repeat across schemes and lookups; datetime is immutable, so sharing results is safe.
+@lru_cache(maxsize=8192)
+def _parse_iso_date_text(text: str) -> Optional[datetime]:
     if not text:
         return None
+    try:
+        parsed = datetime.fromisoformat(text.replace("Z", "+00:00"))
+        return parsed.replace(tzinfo=None)
+    except ValueError:
+        pass
+    # strptime also accepts unpadded parts such as 2024-1-2.
     try:
         return datetime.strptime(text, "%Y-%m-%d")
     except ValueError:
-        try:
-            parsed = datetime.fromisoformat(text.replace("Z", "+00:00"))
-            return parsed.replace(tzinfo=None)
-        except ValueError:
-            return None
+        return None
 
 
 def _resolve_snapshot_cashflow_date(
@@ -349,9 +382,22 @@ def _safe_optional_text(value: Any, max_length: int = MAX_TEXT_FIELD_CHARS) -> O
     return text or None
 
 
-def _first_text(*values: Any, max_length: int = MAX_TEXT_FIELD_CHARS) -> Optional[str]:
-    for value in values:
-        text = _safe_optional_text(value, max_length=max_length)
+INVESTOR_NAME_KEYS = ("name", "investor_name", "full_name")
+INVESTOR_EMAIL_KEYS = ("email", "email_id", "email_address")
+INVESTOR_ADDRESS_KEYS = ("address", "investor_address", "full_address")
+INVESTOR_PHONE_KEYS = ("mobile", "phone", "phone_number", "mobile_number")
+CAS_PAN_KEYS = ("pan", "pan_number", "pan_no", "PAN")
+FOLIO_PAN_KEYS = ("PAN", "pan", "pan_number", "pan_no")
+
+
+def _first_text_for_keys(
+    source: Dict[str, Any],
+    keys: Tuple[str, ...],
+    max_length: int = MAX_TEXT_FIELD_CHARS,
+) -> Optional[str]:
+    # Later aliases are only looked up when the earlier ones are missing or blank.
+    for key in keys:
+        text = _safe_optional_text(source.get(key), max_length=max_length)
         if text:
             return text
     return None
@@ -633,6 +679,17 @@ async def _parse_pdf_upload(content: bytes, password: str = "") -> Dict[str, Any
 
 
 async def _read_upload_limited(file: UploadFile) -> Tuple[Optional[bytes], Optional[str]]:
+    # The multipart parser records the spooled size, so oversized uploads can be
+    # rejected before any of their bytes are copied into memory.
+    if file.size is not None:
+        if file.size > MAX_UPLOAD_BYTES:
+            return None, "File is too large. Maximum supported size is 25 MB."
+        # Known size: one read yields the final bytes without a chunk list and join copy.
+        content = await file.read(file.size + 1)
+        if len(content) > MAX_UPLOAD_BYTES:
+            return None, "File is too large. Maximum supported size is 25 MB."
+        return content, None
+
     total_read = 0
     chunks: List[bytes] = []
 
@@ -792,14 +849,18 @@ def _validate_cas_json_shape(cas_data: dict) -> Optional[str]:
 
 
 def _benchmark_history_entry_to_iso(d_str: Any, val: Any) -> Optional[Tuple[str, float]]:
+    # NAV histories run to thousands of DD-MM-YYYY keys; splitting is far cheaper than strptime.
     try:
-        dt_obj = datetime.strptime(str(d_str), "%d-%m-%Y")
+        day, month, year = str(d_str).strip().split("-")
+        if len(year) != 4 or not (day.isdigit() and month.isdigit() and year.isdigit()):
+            return None
+        dt_obj = date(int(year), int(month), int(day))
         nav = float(val)
     except (TypeError, ValueError):
         return None
     if not math.isfinite(nav) or nav <= 0:
         return None
-    return dt_obj.strftime("%Y-%m-%d"), nav
+    return dt_obj.isoformat(), nav
 
 
 def _prepare_benchmark_history(raw_history: Dict[str, float]) -> Tuple[Dict[str, float], List[str], List[date], float]:
@@ -811,7 +872,7 @@ def _prepare_benchmark_history(raw_history: Dict[str, float]) -> Tuple[Dict[str,
         iso_key, nav = parsed_entry
         iso_history[iso_key] = nav
     sorted_keys = sorted(iso_history.keys())
-    sorted_dates = [datetime.strptime(d, "%Y-%m-%d").date() for d in sorted_keys]
+    sorted_dates = [date.fromisoformat(d) for d in sorted_keys]
     bench_nav_now = iso_history[sorted_keys[-1]] if sorted_keys else 0.0
     return iso_history, sorted_keys, sorted_dates, bench_nav_now
 
@@ -821,13 +882,30 @@ def _benchmark_nav_for_date(
     benchmark_history: Dict[str, float],
     sorted_iso_keys: List[str],
     sorted_date_objs: List[date],
+    on_date: Optional[date] = None,
+    last_idx: Optional[List[int]] = None,
 ) -> Tuple[Optional[float], bool]:
     if date_str in benchmark_history:
         return benchmark_history[date_str], True
-    dt = _parse_iso_date(date_str)
-    if not dt:
-        return None, False
-    idx = bisect_right(sorted_date_objs, dt.date()) - 1
+    if on_date is None:
+        dt = _parse_iso_date(date_str)
+        if not dt:
+            return None, False
+        on_date = dt.date()
+    # Transactions usually arrive in date order, so the previous hit (or the slot after it)
+    # is normally the answer; last_idx carries that position between calls for one scheme.
+    idx = -1
+    if last_idx is not None:
+        for probe in (last_idx[0], last_idx[0] + 1):
+            if 0 <= probe < len(sorted_date_objs) and sorted_date_objs[probe] <= on_date and (
+                probe + 1 == len(sorted_date_objs) or on_date < sorted_date_objs[probe + 1]
+            ):
+                idx = probe
+                break
+    if idx < 0:
+        idx = bisect_right(sorted_date_objs, on_date) - 1
+    if last_idx is not None and idx >= 0:
+        last_idx[0] = idx
     if idx >= 0:
         return benchmark_history[sorted_iso_keys[idx]], False
     if sorted_iso_keys:
@@ -865,9 +943,12 @@ def _format_benchmark_name(components: List[BenchmarkComponent]) -> Optional[str
 def _nav_from_prepared_history(
     date_str: str,
     prepared_history: Tuple[Dict[str, float], List[str], List[date], float],
+    on_date: Optional[date] = None,
+    last_idx: Optional[List[int]] = None,
 ) -> Tuple[Optional[float], bool]:
+    """on_date, when the caller already parsed date_str, skips re-parsing it on an inexact match."""
     hist, keys, days, _ = prepared_history
-    return _benchmark_nav_for_date(date_str, hist, keys, days)
+    return _benchmark_nav_for_date(date_str, hist, keys, days, on_date, last_idx)
 
 
 async def _fetch_nav_history_for_required_dates(code: str, required_dates: Optional[Set[date]]) -> dict:
@@ -999,8 +1080,21 @@ def _compute_period_xirr(
         return None
     period_flows = [(cutoff_dt, -start_value)]
     period_flows.extend((dt, amt) for dt, amt in cashflows if dt > cutoff_dt)
-    period_flows.append((as_of_dt, end_value))
-    return calculate_xirr([x[0] for x in period_flows], [x[1] for x in period_flows])
+    return _xirr_with_terminal(period_flows, as_of_dt, end_value)
+
+
+def _xirr_with_terminal(
+    cashflows: List[Tuple[datetime, float]],
+    terminal_dt: datetime,
+    terminal_value: float,
+) -> Optional[float]:
+    # Split the (date, amount) pairs into XIRR's two columns in one pass instead of
+    # concatenating the terminal flow onto the list and walking it once per column.
+    dates = [dt for dt, _ in cashflows]
+    amounts = [amt for _, amt in cashflows]
+    dates.append(terminal_dt)
+    amounts.append(terminal_value)
+    return calculate_xirr(dates, amounts)
 
 
 def _parse_percentage(value: Any) -> Optional[float]:
@@ -1044,6 +1138,8 @@ def _extract_scheme_ter_pct(scheme: Dict[str, Any]) -> Optional[float]:
     return None
 
 
+# Called up to twice per scheme (actual plan and direct proxy); a pure function of its inputs.
+@lru_cache(maxsize=1024)
 def _default_ter_pct(category: str, sub_category: str, scheme_name: str, is_direct: bool) -> float:
     cat = (category or "").upper()
     sub = (sub_category or "").upper()
@@ -1074,6 +1170,7 @@ def _years_between(start_dt: Optional[datetime], end_dt: datetime) -> float:
     return max(0.0, (end_dt - start_dt).days / 365.25)
 
 
+@lru_cache(maxsize=1024)
 def _credit_quality_bucket(scheme_name: str, sub_category: str) -> str:
     text = f"{scheme_name or ''} {sub_category or ''}".upper()
     if any(x in text for x in ["CREDIT RISK", "LOW RATED", "HIGH YIELD", "BELOW AA"]):
@@ -1112,13 +1209,12 @@ def _validate_upload(file: UploadFile, content: bytes) -> Optional[str]:
     content_type = (file.content_type or "").split(";", 1)[0].strip().lower()
     if content_type and content_type not in ALLOWED_CONTENT_TYPES[suffix]:
         return "Unsupported content type for uploaded file."
-    stripped = content.lstrip()
-    if suffix == ".pdf" and not stripped.startswith(PDF_MAGIC_PREFIX):
+    leading = UPLOAD_LEADING_CONTENT_PATTERN.search(content)
+    start = leading.start() if leading else len(content)
+    if suffix == ".pdf" and not content.startswith(PDF_MAGIC_PREFIX, start):
         return "Uploaded PDF appears invalid or corrupted."
-    if suffix == ".json":
-        stripped_json = stripped[3:] if stripped.startswith(b"\xef\xbb\xbf") else stripped
-        if not (stripped_json.startswith(b"{") or stripped_json.startswith(b"[")):
-            return "Uploaded JSON appears invalid."
+    if suffix == ".json" and not content.startswith(JSON_START_PREFIXES, start):
+        return "Uploaded JSON appears invalid."
     return None
 
 
@@ -1255,6 +1351,32 @@ class GuidelinesData(BaseModel):
     fi_indicative: List[FixedIncomeIndicative]
 
 
+# Template guidance is identical for every analysis. Rows stay plain data; each response gets its own
+# models via model_construct (the constants are already valid), so no instance is shared across users.
+GUIDELINE_FI_METRICS = (
+    {"label": "Net YTM", "current": 0.0, "recommended": 11.06},
+    {"label": "Average Maturity (Years)", "current": 0.0, "recommended": 2.27},
+)
+GUIDELINE_EQUITY_INDICATIVE = (
+    {"category": "Large Cap - Index", "allocation": 25.0},
+    {"category": "Focused", "allocation": 20.0},
+    {"category": "Contra", "allocation": 17.0},
+    {"category": "Flexi Cap", "allocation": 15.0},
+    {"category": "Mid Cap", "allocation": 12.5},
+    {"category": "Small Cap", "allocation": 10.0},
+    {"category": "Liquid", "allocation": 0.5},
+)
+GUIDELINE_FI_INDICATIVE = (
+    {"issuer": "Diversified Book", "pqrs": 4.51, "ytm": 10.85, "tenure": 3.70, "allocation": 20.0},
+    {"issuer": "Micro Finance/PTC", "pqrs": 4.09, "ytm": 11.9, "tenure": 1.4, "allocation": 20.0},
+    {"issuer": "MSME/Personal", "pqrs": 3.80, "ytm": 11.2, "tenure": 1.65, "allocation": 15.0},
+    {"issuer": "SME Finance/Education", "pqrs": 4.13, "ytm": 10.7, "tenure": 1.65, "allocation": 15.0},
+    {"issuer": "Education Finance", "pqrs": 3.80, "ytm": 10.5, "tenure": 2.48, "allocation": 10.0},
+    {"issuer": "Enterprise Book/Supply Chain", "pqrs": 4.13, "ytm": 10.5, "tenure": 1.1, "allocation": 5.0},
+    {"issuer": "Invits", "ytm": 11.0, "tenure": 3.0, "allocation": 15.0},
+)
+
+
 class OverlapData(BaseModel):
     fund_codes: List[str]
     fund_names: List[str]
@@ -1372,6 +1494,13 @@ def _safe_analysis_response(response: AnalysisResponse) -> AnalysisResponse:
     return _sanitize_nonfinite_json_values(response)
 
 
+def _orjson_response(content: Any, status_code: int = 200) -> Response:
+    # orjson handles dicts, lists, dates and enums natively; anything else (Decimal, sets,
+    # models) falls back to FastAPI's encoder so the JSON shape matches JSONResponse.
+    body = orjson.dumps(content, default=jsonable_encoder, option=orjson.OPT_NON_STR_KEYS)
+    return Response(content=body, status_code=status_code, media_type="application/json")
+
+
 class AuthSessionResponse(BaseModel):
     user_id: str
     username: str
@@ -1564,18 +1693,29 @@ async def map_casparser_to_analysis(cas_data: dict) -> AnalysisResponse:
     analysis_now_dt = datetime.now()
     one_year_cutoff_dt = analysis_now_dt - timedelta(days=365)
     three_year_cutoff_dt = analysis_now_dt - timedelta(days=365 * 3)
+    # Lots acquired on or before this date have been held for at least 365 days.
+    long_term_cutoff_date = analysis_now_dt.date() - timedelta(days=365)
 
     total_cost = 0.0
     total_mkt_live = 0.0
     total_mkt_statement = 0.0
+    # Category and benchmark-coverage totals, accumulated as each holding is built.
+    total_equity_val = 0.0
+    total_equity_cost = 0.0
+    total_equity_gain = 0.0
+    total_fi_cost = 0.0
+    total_fi_gain = 0.0
+    benchmark_covered_value = 0.0
+    benchmark_unresolved_holdings = 0
+    benchmark_fallback_holdings = 0
     amcs = set()
     schemes_seen = set()
-    scheme_values: Dict[str, float] = {}
-    amc_values: Dict[str, float] = {}
+    scheme_values: Dict[str, float] = defaultdict(float)
+    amc_values: Dict[str, float] = defaultdict(float)
     direct_value = 0.0
     regular_value = 0.0
     mc_values = {"Large-Cap": 0.0, "Mid-Cap": 0.0, "Small-Cap": 0.0}
-    allocation_map: Dict[str, float] = {}
+    allocation_map: Dict[str, float] = defaultdict(float)
     portfolio_cashflows: List[Tuple[datetime, float]] = []
     equity_cashflows: List[Tuple[datetime, float]] = []
     fi_cashflows: List[Tuple[datetime, float]] = []
@@ -1590,9 +1730,9 @@ async def map_casparser_to_analysis(cas_data: dict) -> AnalysisResponse:
     benchmark_txn_exact = 0
     fi_mkt = 0.0
     fi_cost = 0.0
-    fi_amc_values: Dict[str, float] = {}
-    fi_scheme_values: Dict[str, float] = {}
-    fi_alloc_map: Dict[str, float] = {}
+    fi_amc_values: Dict[str, float] = defaultdict(float)
+    fi_scheme_values: Dict[str, float] = defaultdict(float)
+    fi_alloc_map: Dict[str, float] = defaultdict(float)
     credit_values = {"AAA": 0.0, "AA": 0.0, "Below AA": 0.0}
     perf_diffs_weighted_1y: List[Tuple[float, float]] = []
     perf_diffs_weighted_3y: List[Tuple[float, float]] = []
@@ -1667,22 +1807,33 @@ async def map_casparser_to_analysis(cas_data: dict) -> AnalysisResponse:
     try:
         amfi_codes = sorted(all_amfis)
         benchmark_codes = sorted(benchmark_codes_needed)
+        # Large portfolios would otherwise open one upstream request per scheme at once.
+        prefetch_slots = asyncio.Semaphore(NAV_PREFETCH_MAX_CONCURRENCY)
+
+        async def _bounded(fetch):
+            async with prefetch_slots:
+                return await fetch
 
         live_nav_results, benchmark_history_results, scheme_history_results = await asyncio.gather(
-            asyncio.gather(*[fetch_live_nav(code) for code in amfi_codes], return_exceptions=True),
+            asyncio.gather(*[_bounded(fetch_live_nav(code)) for code in amfi_codes], return_exceptions=True),
             asyncio.gather(
                 *[
-                    _fetch_benchmark_history_for_proxy(
-                        code,
-                        proxy_index_key_by_code.get(code),
-                        history_dates_by_code.get(code),
+                    _bounded(
+                        _fetch_benchmark_history_for_proxy(
+                            code,
+                            proxy_index_key_by_code.get(code),
+                            history_dates_by_code.get(code),
+                        )
                     )
                     for code in benchmark_codes
                 ],
                 return_exceptions=True,
             ),
             asyncio.gather(
-                *[_fetch_nav_history_for_required_dates(code, history_dates_by_code.get(code)) for code in amfi_codes],
+                *[
+                    _bounded(_fetch_nav_history_for_required_dates(code, history_dates_by_code.get(code)))
+                    for code in amfi_codes
+                ],
                 return_exceptions=True,
             ),
         )
@@ -1713,13 +1864,14 @@ async def map_casparser_to_analysis(cas_data: dict) -> AnalysisResponse:
             f"benchmark_histories={len(benchmark_histories_prepared)}, "
             f"scheme_histories={len(scheme_histories_prepared)}"
         )
+        # The file write itself runs in a worker thread; awaiting here keeps the save supervised.
         await save_cache_async()
     except Exception as e:
         add_warning("LIVE_NAV_FETCH_FAILED", "valuation", "warn", "Live NAV fetch failed or timed out; benchmark metrics may be missing.")
         log_debug(f"Pre-fetch error or timeout: {type(e).__name__}: {e}")
 
     nav_missing_schemes = set()
-    benchmark_fallback_by_scheme: Dict[str, int] = {}
+    benchmark_fallback_by_scheme: Dict[str, int] = defaultdict(int)
 
     for folio_data in folios:
         if not isinstance(folio_data, dict):
@@ -1799,11 +1951,13 @@ async def map_casparser_to_analysis(cas_data: dict) -> AnalysisResponse:
             scheme_cost = 0.0
             purchase_cost_total = 0.0
             scheme_cashflows: List[Tuple[datetime, float]] = []
-            scheme_tx_dates: List[datetime] = []
+            scheme_entry_dt: Optional[datetime] = None
             scheme_unit_events: List[Tuple[datetime, float]] = []
             lot_events: List[Tuple[datetime, float, float]] = []
             scheme_benchmark_units: Dict[str, float] = {comp.code: 0.0 for comp in benchmark_components}
             scheme_benchmark_unit_events: Dict[str, List[Tuple[datetime, float]]] = {comp.code: [] for comp in benchmark_components}
+            # Last matched history position per component, reset for every scheme.
+            benchmark_lookup_hints: Dict[str, List[int]] = {comp.code: [0] for comp in benchmark_components}
 
             transactions = scheme.get("transactions", [])
             if not isinstance(transactions, list):
@@ -1823,7 +1977,8 @@ async def map_casparser_to_analysis(cas_data: dict) -> AnalysisResponse:
                 raw_units = _parse_amount(txn.get("units")) or 0.0
                 if abs(raw_units) > 0:
                     scheme_unit_events.append((dt, raw_units))
-                    scheme_tx_dates.append(dt)
+                    if scheme_entry_dt is None or dt < scheme_entry_dt:
+                        scheme_entry_dt = dt
 
                 raw_amt = _parse_amount(txn.get("amount"))
                 if raw_amt is None or raw_amt == 0:
@@ -1869,8 +2024,8 @@ async def map_casparser_to_analysis(cas_data: dict) -> AnalysisResponse:
                 log_debug("TXN_DEBUG: recorded scheme cashflow")
 
                 scheme_cashflows.append((dt, cashflow))
-                if dt not in scheme_tx_dates:
-                    scheme_tx_dates.append(dt)
+                if scheme_entry_dt is None or dt < scheme_entry_dt:
+                    scheme_entry_dt = dt
                 if not is_withdrawal:
                     purchase_cost_total += amt
 
@@ -1880,12 +2035,15 @@ async def map_casparser_to_analysis(cas_data: dict) -> AnalysisResponse:
                     benchmark_cashflows.append((dt, cashflow))
                     if is_equity_sebi_category(benchmark_resolution.sebi_category):
                         equity_benchmark_cashflows.append((dt, cashflow))
+                    txn_day = dt.date()
                     for comp in benchmark_components:
                         history_bundle = benchmark_histories_prepared.get(comp.code)
                         if not history_bundle:
                             continue
                         benchmark_txn_total += 1
-                        b_nav, is_exact = _nav_from_prepared_history(date_str, history_bundle)
+                        b_nav, is_exact = _nav_from_prepared_history(
+                            date_str, history_bundle, txn_day, benchmark_lookup_hints.get(comp.code)
+                        )
                         if not b_nav:
                             continue
                         # IDCW/interest payouts can appear as zero-unit withdrawals. They should not
@@ -1898,14 +2056,13 @@ async def map_casparser_to_analysis(cas_data: dict) -> AnalysisResponse:
                         if is_exact:
                             benchmark_txn_exact += 1
                         else:
-                            benchmark_fallback_by_scheme[name] = benchmark_fallback_by_scheme.get(name, 0) + 1
+                            benchmark_fallback_by_scheme[name] += 1
 
             val = scheme.get("valuation", {})
             if not isinstance(val, dict):
                 val = {}
 
             parsed_cost = _parse_amount(val.get("cost")) if "cost" in val else None
-            scheme_entry_dt = min(scheme_tx_dates) if scheme_tx_dates else None
             remaining_lots = _rebuild_remaining_tax_lots(
                 units,
                 lot_events,
@@ -1929,7 +2086,8 @@ async def map_casparser_to_analysis(cas_data: dict) -> AnalysisResponse:
                     cashflow = -scheme_cost
                     date_str = synthetic_dt.strftime("%Y-%m-%d")
                     scheme_cashflows.append((synthetic_dt, cashflow))
-                    scheme_tx_dates.append(synthetic_dt)
+                    if scheme_entry_dt is None or synthetic_dt < scheme_entry_dt:
+                        scheme_entry_dt = synthetic_dt
                     scheme_unit_events.append((synthetic_dt, units))
                     portfolio_cashflows.append((synthetic_dt, cashflow))
                     if cat == "Equity":
@@ -1945,7 +2103,7 @@ async def map_casparser_to_analysis(cas_data: dict) -> AnalysisResponse:
                             if not history_bundle:
                                 continue
                             benchmark_txn_total += 1
-                            b_nav, is_exact = _nav_from_prepared_history(date_str, history_bundle)
+                            b_nav, is_exact = _nav_from_prepared_history(date_str, history_bundle, synthetic_dt.date())
                             if not b_nav:
                                 continue
                             txn_bm_units = ((-cashflow) * comp.weight) / b_nav
@@ -1958,14 +2116,10 @@ async def map_casparser_to_analysis(cas_data: dict) -> AnalysisResponse:
                             if is_exact:
                                 benchmark_txn_exact += 1
                             else:
-                                benchmark_fallback_by_scheme[name] = (
-                                    benchmark_fallback_by_scheme.get(name, 0) + 1
-                                )
+                                benchmark_fallback_by_scheme[name] += 1
                     performance_source = "estimated_snapshot"
                     estimated_performance_holdings += 1
 
-            scheme_entry_dt = min(scheme_tx_dates) if scheme_tx_dates else None
-
             statement_nav = _parse_amount(val.get("nav")) or 0.0
             statement_value_raw = val.get("value")
             statement_value = _parse_amount(statement_value_raw)
@@ -1999,9 +2153,9 @@ async def map_casparser_to_analysis(cas_data: dict) -> AnalysisResponse:
             else:
                 regular_value += mkt_val
 
-            amc_values[amc_name] = amc_values.get(amc_name, 0.0) + mkt_val
-            scheme_values[name] = scheme_values.get(name, 0.0) + mkt_val
-            allocation_map[sub_cat] = allocation_map.get(sub_cat, 0.0) + mkt_val
+            amc_values[amc_name] += mkt_val
+            scheme_values[name] += mkt_val
+            allocation_map[sub_cat] += mkt_val
 
             current_holding_entry_dt = _current_holding_entry_date(units, lot_events, scheme_entry_dt)
             gain = mkt_val - scheme_cost
@@ -2014,9 +2168,9 @@ async def map_casparser_to_analysis(cas_data: dict) -> AnalysisResponse:
             if cat == "Fixed Income":
                 fi_mkt += mkt_val
                 fi_cost += scheme_cost
-                fi_amc_values[amc_name] = fi_amc_values.get(amc_name, 0.0) + mkt_val
-                fi_scheme_values[name] = fi_scheme_values.get(name, 0.0) + mkt_val
-                fi_alloc_map[sub_cat] = fi_alloc_map.get(sub_cat, 0.0) + mkt_val
+                fi_amc_values[amc_name] += mkt_val
+                fi_scheme_values[name] += mkt_val
+                fi_alloc_map[sub_cat] += mkt_val
                 fi_cashflows.extend(scheme_cashflows)
                 credit_bucket = _credit_quality_bucket(name, sub_cat)
                 credit_values[credit_bucket] += mkt_val
@@ -2035,14 +2189,13 @@ async def map_casparser_to_analysis(cas_data: dict) -> AnalysisResponse:
                 savings_value_est += avg_value_for_cost * (ter_gap / 100.0) * holding_years
 
             if cat == "Equity" and units > 0 and effective_nav > 0:
-                lots = list(remaining_lots)
-                for lot in lots:
+                for lot in remaining_lots:
                     if lot.units <= 0:
                         continue
                     lot_cost = lot.units * lot.cost_per_unit
                     lot_mkt = lot.units * effective_nav
                     lot_gain = lot_mkt - lot_cost
-                    is_long_term_lot = (analysis_now_dt.date() - lot.acquired_on.date()).days >= 365
+                    is_long_term_lot = lot.acquired_on.date() <= long_term_cutoff_date
                     if is_long_term_lot:
                         if lot_gain >= 0:
                             tax_long_term_gains += lot_gain
@@ -2068,11 +2221,9 @@ async def map_casparser_to_analysis(cas_data: dict) -> AnalysisResponse:
             position_cutoff_dt = current_holding_entry_dt or scheme_entry_dt
 
             if scheme_cashflows:
-                s_flows = scheme_cashflows + [(analysis_now_dt, mkt_val)]
-                s_xirr = calculate_xirr([x[0] for x in s_flows], [x[1] for x in s_flows])
+                s_xirr = _xirr_with_terminal(scheme_cashflows, analysis_now_dt, mkt_val)
                 if s_bm_val > 0:
-                    s_flows_bm = [(dt, amt_val) for dt, amt_val in scheme_cashflows] + [(analysis_now_dt, s_bm_val)]
-                    s_bm_xirr = calculate_xirr([x[0] for x in s_flows_bm], [x[1] for x in s_flows_bm])
+                    s_bm_xirr = _xirr_with_terminal(scheme_cashflows, analysis_now_dt, s_bm_val)
                     s_missed_gains = s_bm_val - mkt_val
 
                 if position_cutoff_dt and position_cutoff_dt < analysis_now_dt:
@@ -2197,6 +2348,19 @@ async def map_casparser_to_analysis(cas_data: dict) -> AnalysisResponse:
             total_cost += scheme_cost
             total_mkt_live += mkt_val
             total_mkt_statement += statement_mkt_val
+            if h_obj.category == "Equity":
+                total_equity_val += h_obj.market_value
+                total_equity_cost += h_obj.cost_value
+                total_equity_gain += h_obj.gain_loss
+            elif h_obj.category == "Fixed Income":
+                total_fi_cost += h_obj.cost_value
+                total_fi_gain += h_obj.gain_loss
+            if (h_obj.benchmark_source or "") in BENCHMARK_AUTHORITATIVE_SOURCES:
+                benchmark_covered_value += h_obj.market_value
+            elif h_obj.benchmark_source == "unresolved":
+                benchmark_unresolved_holdings += 1
+            elif h_obj.benchmark_source == "fallback":
+                benchmark_fallback_holdings += 1
 
     if nav_missing_schemes:
         add_warning(
@@ -2210,34 +2374,19 @@ async def map_casparser_to_analysis(cas_data: dict) -> AnalysisResponse:
         add_warning("CATEGORY_AMBIGUOUS", "classification", "warn", f"{ambiguous_category_count} scheme(s) had ambiguous classification and were mapped conservatively.")
 
     now_dt = analysis_now_dt
-    pf_xirr = calculate_xirr(
-        [x[0] for x in (portfolio_cashflows + [(now_dt, total_mkt_live)])],
-        [x[1] for x in (portfolio_cashflows + [(now_dt, total_mkt_live)])],
-    )
+    pf_xirr = _xirr_with_terminal(portfolio_cashflows, now_dt, total_mkt_live)
     benchmark_val_now = benchmark_terminal_value
     log_debug("Summary BM XIRR inputs prepared")
     bm_xirr = None
     if benchmark_cashflows and benchmark_val_now > 0:
-        bm_xirr = calculate_xirr(
-            [x[0] for x in (benchmark_cashflows + [(now_dt, benchmark_val_now)])],
-            [x[1] for x in (benchmark_cashflows + [(now_dt, benchmark_val_now)])],
-        )
+        bm_xirr = _xirr_with_terminal(benchmark_cashflows, now_dt, benchmark_val_now)
     log_debug("XIRR_RESULT_DEBUG: summary XIRR calculated")
 
-    total_equity_val = sum(h.market_value for h in holdings if h.category == "Equity")
-    total_equity_cost = sum(h.cost_value for h in holdings if h.category == "Equity")
-
-    eq_xirr = calculate_xirr(
-        [x[0] for x in (equity_cashflows + [(now_dt, total_equity_val)])],
-        [x[1] for x in (equity_cashflows + [(now_dt, total_equity_val)])],
-    )
+    eq_xirr = _xirr_with_terminal(equity_cashflows, now_dt, total_equity_val)
     eq_benchmark_val_now = equity_benchmark_terminal_value
     eq_bm_xirr = None
     if equity_benchmark_cashflows and eq_benchmark_val_now > 0:
-        eq_bm_xirr = calculate_xirr(
-            [x[0] for x in (equity_benchmark_cashflows + [(now_dt, eq_benchmark_val_now)])],
-            [x[1] for x in (equity_benchmark_cashflows + [(now_dt, eq_benchmark_val_now)])],
-        )
+        eq_bm_xirr = _xirr_with_terminal(equity_benchmark_cashflows, now_dt, eq_benchmark_val_now)
     log_debug("EQ_XIRR_DEBUG: equity XIRR calculated")
     total_equity_bm_gain = eq_benchmark_val_now - equity_benchmark_cost_total if eq_benchmark_val_now > 0 else 0.0
 
@@ -2254,12 +2403,6 @@ async def map_casparser_to_analysis(cas_data: dict) -> AnalysisResponse:
             "Benchmark calculation excludes some scheme cashflows where benchmark proxies were unavailable.",
         )
 
-    authoritative_sources = {"sebi_tier1", "underlying_index"}
-    benchmark_covered_value = sum(
-        h.market_value for h in holdings if (h.benchmark_source or "") in authoritative_sources
-    )
-    benchmark_unresolved_holdings = sum(1 for h in holdings if h.benchmark_source == "unresolved")
-    benchmark_fallback_holdings = sum(1 for h in holdings if h.benchmark_source == "fallback")
     benchmark_coverage_pct = (
         round((benchmark_covered_value / total_mkt_live) * 100, 2) if total_mkt_live > 0 else 100.0
     )
@@ -2306,9 +2449,6 @@ async def map_casparser_to_analysis(cas_data: dict) -> AnalysisResponse:
         for k, v in sorted_amcs
     ] if total_mkt_live > 0 else []
 
-    total_equity_gain = sum(h.gain_loss for h in holdings if h.category == "Equity")
-    total_fi_cost = sum(h.cost_value for h in holdings if h.category == "Fixed Income")
-    total_fi_gain = sum(h.gain_loss for h in holdings if h.category == "Fixed Income")
 
 
     mc_total = sum(mc_values.values())
@@ -2331,10 +2471,7 @@ async def map_casparser_to_analysis(cas_data: dict) -> AnalysisResponse:
 
     fi_irr = None
     if fi_mkt > 0 and fi_cashflows:
-        fi_irr = calculate_xirr(
-            [x[0] for x in (fi_cashflows + [(now_dt, fi_mkt)])],
-            [x[1] for x in (fi_cashflows + [(now_dt, fi_mkt)])],
-        )
+        fi_irr = _xirr_with_terminal(fi_cashflows, now_dt, fi_mkt)
 
     fi_data = None
     if fi_mkt > 0:
@@ -2357,10 +2494,15 @@ async def map_casparser_to_analysis(cas_data: dict) -> AnalysisResponse:
     def calc_perf_metric(weighted_diffs: List[Tuple[float, float]], denominator_weight: float) -> PerfMetric:
         if denominator_weight <= 0:
             return PerfMetric(comparable_pct=0, underperforming_pct=0, upto_3_pct=0, more_than_3_pct=0)
-        comparable_w = sum(w for w, _ in weighted_diffs)
-        under_w = sum(w for w, d in weighted_diffs if d < 0)
-        upto_3_w = sum(w for w, d in weighted_diffs if -3 <= d < 0)
-        more_3_w = sum(w for w, d in weighted_diffs if d < -3)
+        comparable_w = under_w = upto_3_w = more_3_w = 0.0
+        for w, d in weighted_diffs:
+            comparable_w += w
+            if d < 0:
+                under_w += w
+                if d >= -3:
+                    upto_3_w += w
+                else:
+                    more_3_w += w
         return PerfMetric(
             comparable_pct=round((comparable_w / denominator_weight) * 100, 1),
             underperforming_pct=round((under_w / denominator_weight) * 100, 1),
@@ -2453,53 +2595,34 @@ async def map_casparser_to_analysis(cas_data: dict) -> AnalysisResponse:
                 GuidelineItem(label="Mid Cap", current=mc_alloc.mid_cap, recommended=20.0),
                 GuidelineItem(label="Small Cap", current=mc_alloc.small_cap, recommended=13.0),
             ],
-            fi_metrics=[
-                GuidelineItem(label="Net YTM", current=0.0, recommended=11.06),
-                GuidelineItem(label="Average Maturity (Years)", current=0.0, recommended=2.27),
-            ],
+            fi_metrics=[GuidelineItem.model_construct(**row) for row in GUIDELINE_FI_METRICS],
         ),
-        equity_indicative=[
-            EquityIndicative(category="Large Cap - Index", allocation=25.0),
-            EquityIndicative(category="Focused", allocation=20.0),
-            EquityIndicative(category="Contra", allocation=17.0),
-            EquityIndicative(category="Flexi Cap", allocation=15.0),
-            EquityIndicative(category="Mid Cap", allocation=12.5),
-            EquityIndicative(category="Small Cap", allocation=10.0),
-            EquityIndicative(category="Liquid", allocation=0.5),
-        ],
-        fi_indicative=[
-            FixedIncomeIndicative(issuer="Diversified Book", pqrs=4.51, ytm=10.85, tenure=3.70, allocation=20.0),
-            FixedIncomeIndicative(issuer="Micro Finance/PTC", pqrs=4.09, ytm=11.9, tenure=1.4, allocation=20.0),
-            FixedIncomeIndicative(issuer="MSME/Personal", pqrs=3.80, ytm=11.2, tenure=1.65, allocation=15.0),
-            FixedIncomeIndicative(issuer="SME Finance/Education", pqrs=4.13, ytm=10.7, tenure=1.65, allocation=15.0),
-            FixedIncomeIndicative(issuer="Education Finance", pqrs=3.80, ytm=10.5, tenure=2.48, allocation=10.0),
-            FixedIncomeIndicative(issuer="Enterprise Book/Supply Chain", pqrs=4.13, ytm=10.5, tenure=1.1, allocation=5.0),
-            FixedIncomeIndicative(issuer="Invits", ytm=11.0, tenure=3.0, allocation=15.0),
-        ],
+        equity_indicative=[EquityIndicative.model_construct(**row) for row in GUIDELINE_EQUITY_INDICATIVE],
+        fi_indicative=[FixedIncomeIndicative.model_construct(**row) for row in GUIDELINE_FI_INDICATIVE],
     )
 
     overlap_data = None
     overlap_source: Literal["real", "none"] = "none"
     overlap_available_funds = 0
-    equity_holdings = [h for h in holdings if h.category == "Equity"]
-    if len(equity_holdings) > MAX_OVERLAP_FUNDS:
+    # One sweep counts equity holdings and collects unique scheme keys in first-seen order.
+    equity_count = 0
+    scheme_names_map: Dict[str, str] = {}
+    for h in holdings:
+        if h.category != "Equity":
+            continue
+        equity_count += 1
+        key = (h.amfi or "").strip() or h.scheme_name
+        if key and key not in scheme_names_map:
+            scheme_names_map[key] = h.scheme_name
+    if equity_count > MAX_OVERLAP_FUNDS:
         add_warning(
             "OVERLAP_TOO_MANY_FUNDS",
             "overlap",
             "warn",
-            f"Overlap matrix skipped because {len(equity_holdings)} equity schemes exceeds the supported limit of {MAX_OVERLAP_FUNDS}.",
+            f"Overlap matrix skipped because {equity_count} equity schemes exceeds the supported limit of {MAX_OVERLAP_FUNDS}.",
         )
-    elif len(equity_holdings) >= 2:
-        seen = set()
-        scheme_order = []
-        scheme_names_map = {}
-        for h in equity_holdings:
-            key = (h.amfi or "").strip() or h.scheme_name
-            if not key or key in seen:
-                continue
-            seen.add(key)
-            scheme_order.append(key)
-            scheme_names_map[key] = h.scheme_name
+    elif equity_count >= 2:
+        scheme_order = list(scheme_names_map)
 
         try:
             holdings_by_scheme = await get_holdings_for_schemes(scheme_order, scheme_names=scheme_names_map)
@@ -2528,29 +2651,17 @@ async def map_casparser_to_analysis(cas_data: dict) -> AnalysisResponse:
     investor_data: Dict[str, str] = {}
     if isinstance(investor_obj, dict):
         investor_data = {
-            "name": _first_text(investor_obj.get("name"), investor_obj.get("investor_name"), investor_obj.get("full_name")),
-            "email": _first_text(investor_obj.get("email"), investor_obj.get("email_id"), investor_obj.get("email_address")),
-            "address": _first_text(investor_obj.get("address"), investor_obj.get("investor_address"), investor_obj.get("full_address")),
-            "phone": _first_text(investor_obj.get("mobile"), investor_obj.get("phone"), investor_obj.get("phone_number"), investor_obj.get("mobile_number"), max_length=80),
+            "name": _first_text_for_keys(investor_obj, INVESTOR_NAME_KEYS),
+            "email": _first_text_for_keys(investor_obj, INVESTOR_EMAIL_KEYS),
+            "address": _first_text_for_keys(investor_obj, INVESTOR_ADDRESS_KEYS),
+            "phone": _first_text_for_keys(investor_obj, INVESTOR_PHONE_KEYS, max_length=80),
         }
-    investor_data["pan"] = _first_text(
-        cas_data.get("pan"),
-        cas_data.get("pan_number"),
-        cas_data.get("pan_no"),
-        cas_data.get("PAN"),
-        max_length=20,
-    )
+    investor_data["pan"] = _first_text_for_keys(cas_data, CAS_PAN_KEYS, max_length=20)
     if not investor_data.get("pan"):
         for folio in cas_data.get("folios") or []:
             if not isinstance(folio, dict):
                 continue
-            pan = _first_text(
-                folio.get("PAN"),
-                folio.get("pan"),
-                folio.get("pan_number"),
-                folio.get("pan_no"),
-                max_length=20,
-            )
+            pan = _first_text_for_keys(folio, FOLIO_PAN_KEYS, max_length=20)
             if pan:
                 investor_data["pan"] = pan
                 break
@@ -2831,6 +2942,13 @@ async def analyze(
     file: UploadFile = File(...),
     password: str = Form(""),
 ):
+    response = await _analyze_upload(request, file, password)
+    # The response is built from validated models already; serializing it directly in
+    # pydantic-core skips FastAPI's re-validation and jsonable_encoder walk over every holding.
+    return Response(content=response.model_dump_json(), media_type="application/json")
+
+
+async def _analyze_upload(request: Request, file: UploadFile, password: str) -> AnalysisResponse:
     auth_user = await require_supabase_user(request)
     request_id = uuid.uuid4().hex[:10]
     started_at = perf_counter()
@@ -3070,12 +3188,21 @@ async def parse_pdf(
                 message="Parsed CAS PDF to Excel.",
                 metadata={"output_format": "excel"},
             )
-            excel_buffer = convert_to_excel(parsed_data)
-            return StreamingResponse(
-                excel_buffer,
-                media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-                headers={"Content-Disposition": "attachment; filename=portfolio.xlsx"},
-            )
+            excel_buffer = None
+            try:
+                # xlsxwriter builds the workbook in pure Python; keep it off the event loop.
+                excel_buffer = await asyncio.to_thread(convert_to_excel, parsed_data)
+                return StreamingResponse(
+                    iter(lambda: excel_buffer.read(EXCEL_STREAM_CHUNK_BYTES), b""),
+                    media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                    headers={"Content-Disposition": "attachment; filename=portfolio.xlsx"},
+                    background=BackgroundTask(excel_buffer.close),
+                )
+            except BaseException:
+                # Once the response exists its background task closes the buffer; before that, we must.
+                if excel_buffer is not None:
+                    excel_buffer.close()
+                raise
         record_audit_log(
             user_id=auth_user.user_id,
             username=auth_user.username,
@@ -3085,7 +3212,7 @@ async def parse_pdf(
             message="Parsed CAS PDF to JSON.",
             metadata={"output_format": "json"},
         )
-        return JSONResponse(content=jsonable_encoder(parsed_data))
+        return _orjson_response(parsed_data)
     except HTTPException:
         await refund_report_access_if_needed()
         raise
@@ -85,7 +85,9 @@ def _pairwise_overlap(
 ) -> float:
     """Overlap % = sum of min(weight_a[s], weight_b[s]) for common s."""
     total = 0.0
-    common = set(map_a) & set(map_b)
-    for s in common:
-        total += min(map_a[s], map_b[s])
+    # Intersect the key views directly and inline min(); this runs for every fund pair.
+    for s in map_a.keys() & map_b.keys():
+        weight_a = map_a[s]
+        weight_b = map_b[s]
+        total += weight_a if weight_a < weight_b else weight_b
     return total
@@ -3,12 +3,19 @@ import html
 from datetime import datetime, date, timedelta
 import httpx
 import math
+from itertools import repeat
+from operator import truediv
 from pathlib import Path
 from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
 
+import atexit
 import json
+import logging
 import os
 import asyncio
+import queue
+import time
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 
 # Global caches (In-memory + Disk)
 _nav_cache: Dict[str, float] = {}
@@ -17,7 +24,12 @@ _history_cache_years: Dict[str, Set[int]] = {}
 _history_full_cache: Set[str] = set()
 _history_primary_failed_codes: Set[str] = set()
 _nav_cache_date: Optional[str] = None  # ISO date string (YYYY-MM-DD) when NAVs were cached
+_nav_miss_until: Dict[str, float] = {}  # AMFI code -> monotonic expiry for confirmed NAV misses
+NAV_MISS_TTL_SECONDS = 600
 NAV_CACHE_FILE = "data/nav_cache.json"
+DEBUG_LOG_FILE = "data/backend_debug.log"
+_debug_log_handler: Optional[QueueHandler] = None
+_debug_log_ready = False
 AMFI_CODE_PATTERN = re.compile(r"^\d{1,12}$")
 _fetch_locks: Dict[str, asyncio.Lock] = {}
 _http_client: Optional[httpx.AsyncClient] = None
@@ -43,6 +55,51 @@ async def _get_client():
     return _http_client
 
 
+class _DebugLogFormatter(logging.Formatter):
+    """Keep the original `[<datetime.now()>] message` line format."""
+
+    def formatTime(self, record: logging.LogRecord, datefmt: Optional[str] = None) -> str:
+        return str(datetime.fromtimestamp(record.created))
+
+
+def _get_debug_log_handler() -> Optional[QueueHandler]:
+    """
+    Build the one writer for DEBUG_LOG_FILE. Every module's logger enqueues to the same
+    listener thread, which owns the only open file handle and does the rotation.
+    """
+    global _debug_log_handler, _debug_log_ready
+    if not _debug_log_ready:
+        _debug_log_ready = True
+        if os.environ.get("VERCEL"):
+            return None
+        try:
+            Path(DEBUG_LOG_FILE).parent.mkdir(parents=True, exist_ok=True)
+            file_handler = RotatingFileHandler(DEBUG_LOG_FILE, maxBytes=5 * 1024 * 1024, backupCount=1, delay=True)
+        except OSError:
+            return None
+        file_handler.setFormatter(_DebugLogFormatter("[%(asctime)s] %(message)s"))
+        log_queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+        listener = QueueListener(log_queue, file_handler)
+        listener.start()
+        # Drain anything still queued when the worker exits.
+        atexit.register(listener.stop)
+        _debug_log_handler = QueueHandler(log_queue)
+    return _debug_log_handler
+
+
+def get_debug_logger(name: str) -> Optional[logging.Logger]:
+    """Return `name` attached to the shared debug-log writer, or None if file logging is off."""
+    handler = _get_debug_log_handler()
+    if handler is None:
+        return None
+    logger = logging.getLogger(name)
+    if handler not in logger.handlers:
+        logger.addHandler(handler)
+        logger.setLevel(logging.DEBUG)
+        logger.propagate = False
+    return logger
+
+
 def _get_float_env(name: str, default: float, minimum: float, maximum: float) -> float:
     try:
         parsed = float(os.environ.get(name, "").strip())
@@ -122,6 +179,7 @@ def _ensure_fresh_cache():
     today = date.today().isoformat()
     if _nav_cache_date != today:
         _nav_cache = {}
+        _nav_miss_until.clear()
         _nav_cache_date = today
 
 
@@ -191,26 +249,31 @@ async def _get_navall_map() -> Dict[str, float]:
     return _navall_map
 
 
+def _write_nav_cache_file(payload: Dict[str, Any]) -> None:
+    data_str = json.dumps(payload)
+    cache_path = Path(NAV_CACHE_FILE)
+    cache_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(cache_path, "w", encoding="utf-8") as f:
+        f.write(data_str)
+
+
 async def save_cache_async():
     """Save cache to disk without blocking the event loop."""
     try:
         if os.environ.get("VERCEL"):
             return  # Read-only filesystem on Vercel
-        nav_snap = dict(_nav_cache)
-        hist_snap = dict(_history_cache)
-        data_str = json.dumps({
-            "nav": nav_snap,
-            "history": hist_snap,
+        # Snapshot on the loop thread. History dicts are replaced, never edited in place, so a
+        # shallow copy is stable while the worker thread serializes it.
+        payload = {
+            "nav": dict(_nav_cache),
+            "history": dict(_history_cache),
             "history_meta": {
                 "years": {code: sorted(years) for code, years in _history_cache_years.items()},
                 "full": sorted(_history_full_cache),
             },
             "nav_date": _nav_cache_date or date.today().isoformat()
-        })
-        cache_path = Path(NAV_CACHE_FILE)
-        cache_path.parent.mkdir(parents=True, exist_ok=True)
-        with open(cache_path, "w", encoding="utf-8") as f:
-            f.write(data_str)
+        }
+        await asyncio.to_thread(_write_nav_cache_file, payload)
     except Exception:
         return
 
@@ -539,6 +602,8 @@ async def fetch_live_nav(amfi_code: str) -> float:
         
     if amfi_code in _nav_cache:
         return _nav_cache[amfi_code]
+    if _nav_miss_until.get(amfi_code, 0.0) > time.monotonic():
+        return 0.0
         
     # Deduplicate concurrent requests for the same code
     if amfi_code not in _fetch_locks:
@@ -547,6 +612,8 @@ async def fetch_live_nav(amfi_code: str) -> float:
     async with _fetch_locks[amfi_code]:
         if amfi_code in _nav_cache:
             return _nav_cache[amfi_code]
+        if _nav_miss_until.get(amfi_code, 0.0) > time.monotonic():
+            return 0.0
 
         # Official AMFI NAVAll source first.
         navall_map = await _get_navall_map()
@@ -566,6 +633,10 @@ async def fetch_live_nav(amfi_code: str) -> float:
                     if math.isfinite(nav) and nav > 0:
                         _nav_cache[amfi_code] = nav
                         return nav
+            # Both sources answered without a NAV; skip re-asking on every upload for a while.
+            # Timeouts and other errors are not remembered so a flaky upstream is retried.
+            if navall_map and response.status_code in (200, 404):
+                _nav_miss_until[amfi_code] = time.monotonic() + NAV_MISS_TTL_SECONDS
         except Exception:
             return 0.0
             
@@ -663,7 +734,9 @@ def calculate_xirr(dates, amounts) -> Optional[float]:
         if rate <= -0.999999:
             return float("inf")
         try:
-            return sum(a / ((1 + rate) ** t) for a, t in zip(amounts, times))
+            # Same a / (1 + rate) ** t terms, but the loop runs in C: the bisection calls this
+            # dozens of times per scheme, and it dominates XIRR time for long histories.
+            return sum(map(truediv, amounts, map(pow, repeat(1 + rate), times)))
         except Exception:
             return float("inf")
 
@@ -21,7 +21,7 @@ from unittest.mock import AsyncMock, patch
 
 import httpx
 from openpyxl import load_workbook
-from fastapi import HTTPException
+from fastapi import HTTPException, UploadFile
 from fastapi.testclient import TestClient
 
 import app.Code.analytics as analytics_module
@@ -75,11 +75,13 @@ from app.Code.main import (
     _parse_pdf_upload_in_subprocess,
     _parse_pdf_upload,
     _prepare_benchmark_history,
+    _read_upload_limited,
     _validate_cas_json_shape,
     _validate_upload,
     app,
     map_casparser_to_analysis,
     MAX_CAS_TRANSACTIONS,
+    GUIDELINE_FI_INDICATIVE,
     AnalysisResponse,
     Holding,
     _safe_analysis_response,
@@ -143,6 +145,14 @@ class _FakeResponse:
     def json(self):
         return self._payload
 
+    @property
+    def content(self) -> bytes:
+        return json.dumps(self._payload).encode("utf-8")
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise RuntimeError(f"HTTP {self.status_code}")
+
 
 class _FailingAsyncClient:
     def __init__(self, *args, **kwargs):
@@ -154,7 +164,10 @@ class _FailingAsyncClient:
     async def __aexit__(self, exc_type, exc, tb):
         return False
 
-    async def get(self, url):
+    async def get(self, url, **kwargs):
+        raise RuntimeError("timeout")
+
+    def stream(self, method, url, **kwargs):
         raise RuntimeError("timeout")
 
 
@@ -209,6 +222,12 @@ class TestSecurityAccuracy(unittest.IsolatedAsyncioTestCase):
         self.assertIsNotNone(summary.tax)
         self.assertEqual(summary.tax.equity_ltcg_rate_pct, 12.5)
 
+        # Template guidance rows are per-response models; editing one must not leak into the shared template.
+        guidelines = summary.guidelines
+        assert guidelines is not None
+        guidelines.fi_indicative[0].allocation = 99.0
+        self.assertEqual(GUIDELINE_FI_INDICATIVE[0]["allocation"], 20.0)
+
     def test_analysis_response_sanitizes_non_json_float_values(self):
         response = AnalysisResponse(
             success=True,
@@ -1285,6 +1304,42 @@ class TestErrorSanitization(unittest.TestCase):
             self.assertEqual(asyncio.run(fetch_live_nav("100001/../../evil")), 0.0)
             self.assertEqual(asyncio.run(fetch_nav_history("100001/../../evil")), {})
 
+    def test_live_nav_remembers_confirmed_misses_but_not_errors(self):
+        client = AsyncMock()
+        client.get = AsyncMock(return_value=_FakeResponse(200, {"data": []}))
+        with patch.object(utils_module, "_nav_cache", {}), patch.object(
+            utils_module, "_nav_miss_until", {}
+        ), patch("app.Code.utils._ensure_fresh_cache"), patch(
+            "app.Code.utils._get_navall_map", new=AsyncMock(return_value={"100002": 12.5})
+        ), patch("app.Code.utils._get_client", new=AsyncMock(return_value=client)):
+            self.assertEqual(asyncio.run(fetch_live_nav("100001")), 0.0)
+            self.assertEqual(asyncio.run(fetch_live_nav("100001")), 0.0)
+            self.assertEqual(client.get.await_count, 1)
+
+            client.get = AsyncMock(side_effect=RuntimeError("timeout"))
+            self.assertEqual(asyncio.run(fetch_live_nav("100003")), 0.0)
+            self.assertEqual(asyncio.run(fetch_live_nav("100003")), 0.0)
+            self.assertEqual(client.get.await_count, 2)
+
+    def test_live_nav_waiters_reuse_a_miss_recorded_while_they_queued(self):
+        async def slow_empty_response(url, **kwargs):
+            await asyncio.sleep(0)
+            return _FakeResponse(200, {"data": []})
+
+        async def concurrent_lookups():
+            return await asyncio.gather(*(fetch_live_nav("100004") for _ in range(3)))
+
+        client = AsyncMock()
+        client.get = AsyncMock(side_effect=slow_empty_response)
+        with patch.object(utils_module, "_nav_cache", {}), patch.object(
+            utils_module, "_nav_miss_until", {}
+        ), patch.object(utils_module, "_fetch_locks", {}), patch("app.Code.utils._ensure_fresh_cache"), patch(
+            "app.Code.utils._get_navall_map", new=AsyncMock(return_value={"100002": 12.5})
+        ), patch("app.Code.utils._get_client", new=AsyncMock(return_value=client)):
+            self.assertEqual(asyncio.run(concurrent_lookups()), [0.0, 0.0, 0.0])
+
+        self.assertEqual(client.get.await_count, 1)
+
     def test_amfi_history_parser_extracts_target_scheme_rows(self):
         text = (
             "Scheme Code;Scheme Name;ISIN Div Payout/ISIN Growth;ISIN Div Reinvestment;"
@@ -1453,6 +1508,72 @@ class TestErrorSanitization(unittest.TestCase):
         reserve_mock.assert_awaited_once_with("user_test", is_admin=True)
         refund_mock.assert_awaited_once_with("user_test")
 
+    def test_parse_pdf_streams_excel_export(self):
+        client = TestClient(app)
+        payload = {
+            "folios": [
+                {
+                    "amc": "Test AMC",
+                    "folio": "123",
+                    "schemes": [
+                        {
+                            "scheme": "Test Fund",
+                            "transactions": [{"date": "2024-01-02", "description": "Purchase", "amount": 100.0}],
+                        }
+                    ],
+                }
+            ]
+        }
+
+        with patch("app.Code.main.require_supabase_user", new=_fake_require_supabase_user), patch(
+            "app.Code.main.reserve_analysis_credit",
+            new=AsyncMock(return_value=_test_credit_reservation()),
+        ), patch(
+            "app.Code.main._parse_pdf_upload",
+            new=AsyncMock(return_value={"success": True, "data": payload}),
+        ):
+            response = client.post(
+                "/api/parse_pdf",
+                files={"file": ("statement.pdf", b"%PDF-1.7\n", "application/pdf")},
+                data={"password": "", "output_format": "excel"},
+            )
+
+        self.assertEqual(response.status_code, 200)
+        sheet = load_workbook(io.BytesIO(response.content)).active
+        self.assertEqual(sheet["C2"].value, "Test Fund")
+        self.assertEqual(sheet["G2"].value, 100.0)
+
+    def test_parse_pdf_closes_excel_buffer_when_response_is_not_built(self):
+        client = TestClient(app)
+        excel_buffer = io.BytesIO(b"xlsx")
+        refund_mock = AsyncMock()
+
+        with patch("app.Code.main.require_supabase_user", new=_fake_require_supabase_user), patch(
+            "app.Code.main.reserve_analysis_credit",
+            new=AsyncMock(return_value=_test_credit_reservation()),
+        ), patch(
+            "app.Code.main.refund_analysis_credit",
+            new=refund_mock,
+        ), patch(
+            "app.Code.main._parse_pdf_upload",
+            new=AsyncMock(return_value={"success": True, "data": {"folios": []}}),
+        ), patch(
+            "app.Code.main.convert_to_excel",
+            return_value=excel_buffer,
+        ), patch(
+            "app.Code.main.StreamingResponse",
+            side_effect=RuntimeError("response failed"),
+        ):
+            response = client.post(
+                "/api/parse_pdf",
+                files={"file": ("statement.pdf", b"%PDF-1.7\n", "application/pdf")},
+                data={"password": "", "output_format": "excel"},
+            )
+
+        self.assertEqual(response.status_code, 500)
+        self.assertTrue(excel_buffer.closed)
+        refund_mock.assert_awaited_once_with("user_test")
+
     def test_parse_pdf_requires_report_credit_before_processing(self):
         client = TestClient(app)
         parse_mock = AsyncMock(return_value={"success": True, "data": {"folios": []}})
@@ -2430,6 +2551,27 @@ class TestBillingSecurity(unittest.TestCase):
 
 
 class TestParserAndHoldingsResilience(unittest.IsolatedAsyncioTestCase):
+    async def test_read_upload_limited_rejects_spooled_size_without_reading(self):
+        upload = UploadFile(io.BytesIO(b'{"folios": []}'), size=14, filename="sample.json")
+        with patch("app.Code.main.MAX_UPLOAD_BYTES", 10), patch.object(
+            upload, "read", new=AsyncMock(side_effect=AssertionError("read should not be called"))
+        ):
+            content, error = await _read_upload_limited(upload)
+
+        self.assertIsNone(content)
+        self.assertIn("too large", error.lower())
+
+        content, error = await _read_upload_limited(
+            UploadFile(io.BytesIO(b'{"folios": []}'), size=14, filename="sample.json")
+        )
+        self.assertEqual(content, b'{"folios": []}')
+        self.assertIsNone(error)
+
+        with patch("app.Code.main.UPLOAD_READ_CHUNK_BYTES", 4):
+            content, error = await _read_upload_limited(UploadFile(io.BytesIO(b'{"folios": []}'), filename="sample.json"))
+        self.assertEqual(content, b'{"folios": []}')
+        self.assertIsNone(error)
+
     def test_pdf_parse_timeout_default_and_cap(self):
         with patch.dict(os.environ, {"PDF_PARSE_TIMEOUT_SECONDS": ""}, clear=False):
             self.assertEqual(_get_pdf_parse_timeout_seconds(), 120.0)
@@ -2637,6 +2779,30 @@ class TestParserAndHoldingsResilience(unittest.IsolatedAsyncioTestCase):
         self.assertTrue(result["success"])
         named_tmp.assert_not_called()
 
+    def test_parse_with_casparser_buffer_input_skips_tempfile_creation(self):
+        with patch("app.Code.cas_parser.read_cas_pdf", return_value={"folios": []}) as read_pdf, patch(
+            "tempfile.NamedTemporaryFile"
+        ) as named_tmp:
+            buffer = io.BytesIO(b"%PDF-1.7\n")
+            result = parse_with_casparser(buffer, password="ABCDE1234F")
+
+        self.assertTrue(result["success"])
+        named_tmp.assert_not_called()
+        read_pdf.assert_called_once_with(buffer, password="ABCDE1234F")
+
+    def test_parse_with_casparser_dumps_pydantic_result_without_tree_walk(self):
+        class FakeCasData:
+            def model_dump(self, mode="python", by_alias=False):
+                return {"folios": [], "statement_period": {"from": "01-Jan-2024"}}
+
+        with patch("app.Code.cas_parser.read_cas_pdf", return_value=FakeCasData()), patch(
+            "app.Code.cas_parser.recursive_to_dict"
+        ) as tree_walk:
+            result = parse_with_casparser(io.BytesIO(b"%PDF-1.7\n"))
+
+        self.assertEqual(result["data"], {"folios": [], "statement_period": {"from": "01-Jan-2024"}})
+        tree_walk.assert_not_called()
+
     def test_pdf_parse_direct_does_not_swallow_base_exceptions(self):
         class FatalParserExit(BaseException):
             pass
@@ -2669,7 +2835,7 @@ class TestParserAndHoldingsResilience(unittest.IsolatedAsyncioTestCase):
             holdings_module._groww_index_entries = []
 
             class FailingClient:
-                async def get(self, url):
+                async def get(self, url, **kwargs):
                     return _FakeResponse(500, {})
 
             by_code, entries = await holdings_module._get_groww_index(FailingClient())
@@ -2681,6 +2847,36 @@ class TestParserAndHoldingsResilience(unittest.IsolatedAsyncioTestCase):
             holdings_module._groww_index_by_code = old_by_code
             holdings_module._groww_index_entries = old_entries
 
+    async def test_groww_index_records_are_tokenised_for_candidate_scoring(self):
+        old_loaded = holdings_module._groww_index_loaded
+        old_by_code = holdings_module._groww_index_by_code
+        old_entries = holdings_module._groww_index_entries
+        try:
+            holdings_module._groww_index_loaded = False
+
+            class IndexClient:
+                async def get(self, url, **kwargs):
+                    return _FakeResponse(
+                        200,
+                        {
+                            "content": [
+                                {"id": "alpha-large-cap", "scheme_name": "Alpha Large Cap Fund Direct Growth"},
+                                {"id": "beta-flexi-cap", "scheme_name": "Beta Flexi Cap Fund"},
+                            ]
+                        },
+                    )
+
+            _, entries = await holdings_module._get_groww_index(IndexClient())
+            self.assertEqual(entries[0]["tokens"], frozenset({"ALPHA", "LARGE", "CAP"}))
+            self.assertEqual(entries[0]["first_token"], "ALPHA")
+
+            picked = holdings_module._pick_best_groww_candidate(entries, "999", "Alpha Large Cap Fund - Regular Plan")
+            self.assertEqual(picked["id"], "alpha-large-cap")
+        finally:
+            holdings_module._groww_index_loaded = old_loaded
+            holdings_module._groww_index_by_code = old_by_code
+            holdings_module._groww_index_entries = old_entries
+
     async def test_amfi_transient_failure_does_not_persist_failed_urls(self):
         old_cache = holdings_module._amfi_cache
         old_failed = holdings_module._failed_urls
@@ -2688,7 +2884,7 @@ class TestParserAndHoldingsResilience(unittest.IsolatedAsyncioTestCase):
             holdings_module._amfi_cache = {}
             holdings_module._failed_urls = set()
 
-            with patch("app.Code.holdings.httpx.AsyncClient", _FailingAsyncClient), patch(
+            with patch("app.Code.holdings._get_client", new=AsyncMock(return_value=_FailingAsyncClient())), patch(
                 "app.Code.holdings.save_amfi_cache_async", new=AsyncMock()
             ):
                 result = await holdings_module._fetch_amfi_monthly_file()
@@ -2699,6 +2895,435 @@ class TestParserAndHoldingsResilience(unittest.IsolatedAsyncioTestCase):
             holdings_module._amfi_cache = old_cache
             holdings_module._failed_urls = old_failed
 
+    def test_holdings_client_is_recreated_and_closed_per_event_loop(self):
+        clients = []
+
+        async def grab_client():
+            client = await holdings_module._get_client()
+            self.assertIs(await holdings_module._get_client(), client)
+            clients.append(client)
+
+        old_client = holdings_module._http_client
+        old_loop = holdings_module._http_client_loop
+        try:
+            holdings_module._http_client = None
+            asyncio.run(grab_client())
+            asyncio.run(grab_client())
+        finally:
+            holdings_module._http_client = old_client
+            holdings_module._http_client_loop = old_loop
+
+        self.assertIsNot(clients[0], clients[1])
+        # Redirects are opted into per request, so API POSTs never follow them.
+        self.assertFalse(clients[0].follow_redirects)
+        # Each client is closed as its loop shuts down instead of leaking its pool.
+        self.assertTrue(all(client.is_closed for client in clients))
+        self.assertEqual(holdings_module._http_client_guards, set())
+
+    async def test_close_http_client_closes_the_current_holdings_client(self):
+        old_client = holdings_module._http_client
+        old_loop = holdings_module._http_client_loop
+        try:
+            holdings_module._http_client = None
+            client = await holdings_module._get_client()
+            await holdings_module.close_http_client()
+            self.assertTrue(client.is_closed)
+            self.assertIsNone(holdings_module._http_client)
+        finally:
+            holdings_module._http_client = old_client
+            holdings_module._http_client_loop = old_loop
+
+    async def test_amfi_monthly_file_reuses_disk_cache_without_network(self):
+        old_cache = holdings_module._amfi_cache
+        old_dir = holdings_module.AMFI_MONTHLY_CACHE_DIR
+        try:
+            with tempfile.TemporaryDirectory() as tmp_dir:
+                holdings_module._amfi_cache = {}
+                holdings_module.AMFI_MONTHLY_CACHE_DIR = Path(tmp_dir)
+                now = datetime.now(holdings_module.timezone.utc)
+                parsed = {"TEST EQUITY FUND": [("Reliance Industries", 8.5)]}
+                holdings_module._save_amfi_month_to_disk((now.year, now.month), parsed)
+
+                with patch("app.Code.holdings._get_client", side_effect=AssertionError("network used")):
+                    result = await holdings_module._fetch_amfi_monthly_file()
+
+            self.assertEqual(result, parsed)
+            self.assertEqual(holdings_module._amfi_cache[(now.year, now.month)], parsed)
+        finally:
+            holdings_module._amfi_cache = old_cache
+            holdings_module.AMFI_MONTHLY_CACHE_DIR = old_dir
+
+    async def test_amfi_download_streams_workbook_through_temp_file(self):
+        class StreamedResponse:
+            status_code = 200
+
+            async def aiter_bytes(self, chunk_size=None):
+                yield b"chunk-1"
+                yield b"chunk-2"
+
+        class StreamContext:
+            async def __aenter__(self):
+                return StreamedResponse()
+
+            async def __aexit__(self, exc_type, exc, tb):
+                return False
+
+        class StreamingClient:
+            def stream(self, method, url, **kwargs):
+                return StreamContext()
+
+        seen = {}
+        parsed = {"TEST EQUITY FUND": [("Infosys", 5.0)]}
+
+        def fake_parse(path, url):
+            with open(path, "rb") as f:
+                seen.setdefault("bodies", []).append(f.read())
+            seen.setdefault("paths", []).append(path)
+            return parsed
+
+        old_cache = holdings_module._amfi_cache
+        old_failed = holdings_module._failed_urls
+        old_dir = holdings_module.AMFI_MONTHLY_CACHE_DIR
+        try:
+            with tempfile.TemporaryDirectory() as tmp_dir:
+                holdings_module._amfi_cache = {}
+                holdings_module._failed_urls = set()
+                holdings_module.AMFI_MONTHLY_CACHE_DIR = Path(tmp_dir)
+                with patch("app.Code.holdings._get_client", new=AsyncMock(return_value=StreamingClient())), patch(
+                    "app.Code.holdings._parse_amfi_excel_file", side_effect=fake_parse
+                ), patch("app.Code.holdings.save_amfi_cache_async", new=AsyncMock()):
+                    result = await holdings_module._fetch_amfi_monthly_file()
+
+            self.assertEqual(result, parsed)
+            self.assertEqual(seen["bodies"][0], b"chunk-1chunk-2")
+            self.assertFalse(any(os.path.exists(path) for path in seen["paths"]))
+        finally:
+            holdings_module._amfi_cache = old_cache
+            holdings_module._failed_urls = old_failed
+            holdings_module.AMFI_MONTHLY_CACHE_DIR = old_dir
+
+    async def test_amfi_previous_month_is_only_probed_when_current_month_misses(self):
+        requested = []
+
+        class StreamedResponse:
+            def __init__(self, status_code):
+                self.status_code = status_code
+
+            async def aiter_bytes(self, chunk_size=None):
+                yield b"xls"
+
+        class StreamContext:
+            def __init__(self, status_code):
+                self.status_code = status_code
+
+            async def __aenter__(self):
+                return StreamedResponse(self.status_code)
+
+            async def __aexit__(self, exc_type, exc, tb):
+                return False
+
+        class ProbeClient:
+            def __init__(self, statuses):
+                self.statuses = list(statuses)
+
+            def stream(self, method, url, **kwargs):
+                requested.append(url)
+                return StreamContext(self.statuses.pop(0))
+
+        parsed = {"TEST EQUITY FUND": [("Infosys", 5.0)]}
+        old_cache = holdings_module._amfi_cache
+        old_failed = holdings_module._failed_urls
+        old_dir = holdings_module.AMFI_MONTHLY_CACHE_DIR
+        try:
+            with tempfile.TemporaryDirectory() as tmp_dir:
+                holdings_module.AMFI_MONTHLY_CACHE_DIR = Path(tmp_dir)
+                for statuses, expected_requests in (([200, 200], 1), ([404, 200], 2)):
+                    requested.clear()
+                    holdings_module._amfi_cache = {}
+                    holdings_module._failed_urls = set()
+                    for cached in Path(tmp_dir).glob("*.json"):
+                        cached.unlink()
+                    with patch(
+                        "app.Code.holdings._get_client", new=AsyncMock(return_value=ProbeClient(statuses))
+                    ), patch("app.Code.holdings._parse_amfi_excel_file", return_value=parsed), patch(
+                        "app.Code.holdings.save_amfi_cache_async", new=AsyncMock()
+                    ):
+                        result = await holdings_module._fetch_amfi_monthly_file()
+
+                    self.assertEqual(result, parsed)
+                    self.assertEqual(len(requested), expected_requests)
+        finally:
+            holdings_module._amfi_cache = old_cache
+            holdings_module._failed_urls = old_failed
+            holdings_module.AMFI_MONTHLY_CACHE_DIR = old_dir
+
+    def test_calamine_rows_parse_like_xlrd_sheet_values(self):
+        rows = [
+            ["AMFI Portfolio"],
+            ["Sr", "Scheme Name", "Name of the Instrument", "% to NAV"],
+            [1, "  Test  Fund ", "Infosys Ltd", 4],
+            [2, 120503, "HDFC Bank", "2.5%"],
+            [3, "Test Fund"],
+        ]
+        out = {}
+        holdings_module._collect_amfi_sheet_rows(holdings_module._CalamineSheet(rows), out)
+
+        self.assertEqual(out, {"TEST FUND": [("Infosys Ltd", 4.0)], "120503.0": [("HDFC Bank", 2.5)]})
+
+    async def test_amfi_cache_file_round_trips_through_loader(self):
+        old_cache = holdings_module._amfi_cache
+        old_failed = holdings_module._failed_urls
+        old_file = holdings_module.AMFI_CACHE_FILE
+        old_dir = holdings_module.AMFI_MONTHLY_CACHE_DIR
+        old_legacy = holdings_module._amfi_legacy_months
+        try:
+            with tempfile.TemporaryDirectory() as tmp_dir:
+                holdings_module.AMFI_CACHE_FILE = str(Path(tmp_dir) / "amfi_cache.json")
+                holdings_module.AMFI_MONTHLY_CACHE_DIR = Path(tmp_dir) / "amfi_monthly"
+                holdings_module._amfi_cache = {(2024, 3): {"TEST FUND": [("Infosys", 5.0)]}}
+                holdings_module._failed_urls = {"https://portal.amfiindia.com/spages/amfeb2024repo.xls"}
+                holdings_module._amfi_cache_dirty = True
+                with patch.dict(os.environ, {"VERCEL": ""}):
+                    await holdings_module.save_amfi_cache_async()
+
+                with open(holdings_module.AMFI_CACHE_FILE, "r", encoding="utf-8") as f:
+                    saved = json.load(f)
+
+                holdings_module._amfi_cache = {}
+                holdings_module._failed_urls = set()
+                holdings_module._load_amfi_cache()
+                self.assertEqual(
+                    holdings_module._failed_urls, {"https://portal.amfiindia.com/spages/amfeb2024repo.xls"}
+                )
+
+                # Parsed months live in the per-month files; older snapshots that still carry them load as before.
+                self.assertNotIn("cache", saved)
+                saved["cache"] = {"2024-03": {"TEST FUND": [["Infosys", 5.0]]}}
+                with open(holdings_module.AMFI_CACHE_FILE, "w", encoding="utf-8") as f:
+                    json.dump(saved, f)
+                holdings_module._load_amfi_cache()
+                self.assertEqual(holdings_module._amfi_cache, {(2024, 3): {"TEST FUND": [["Infosys", 5.0]]}})
+                # The legacy month moves to its own file, so the slimmer snapshot that follows loses nothing.
+                self.assertEqual(
+                    holdings_module._load_amfi_month_from_disk((2024, 3)), {"TEST FUND": [("Infosys", 5.0)]}
+                )
+                self.assertEqual(holdings_module._amfi_legacy_months, {})
+
+                # A month that cannot be moved stays in the snapshot until it can.
+                holdings_module._amfi_monthly_cache_path((2024, 3)).unlink()
+                with patch("app.Code.holdings._save_amfi_month_to_disk", return_value=False):
+                    holdings_module._load_amfi_cache()
+                holdings_module._amfi_cache_dirty = True
+                with patch.dict(os.environ, {"VERCEL": ""}):
+                    await holdings_module.save_amfi_cache_async()
+                with open(holdings_module.AMFI_CACHE_FILE, "r", encoding="utf-8") as f:
+                    self.assertEqual(json.load(f)["cache"], {"2024-03": {"TEST FUND": [["Infosys", 5.0]]}})
+        finally:
+            holdings_module._amfi_cache = old_cache
+            holdings_module._failed_urls = old_failed
+            holdings_module.AMFI_CACHE_FILE = old_file
+            holdings_module.AMFI_MONTHLY_CACHE_DIR = old_dir
+            holdings_module._amfi_legacy_months = old_legacy
+
+    async def test_groww_holdings_persist_until_ttl_expires(self):
+        old_groww = holdings_module._groww_holdings_cache
+        old_file = holdings_module.AMFI_CACHE_FILE
+        now = time.time()
+        try:
+            with tempfile.TemporaryDirectory() as tmp_dir:
+                holdings_module.AMFI_CACHE_FILE = str(Path(tmp_dir) / "amfi_cache.json")
+                holdings_module._groww_holdings_cache = {
+                    "120503": (now, [("Infosys", 5.0)]),
+                    "118989": (now - holdings_module.GROWW_HOLDINGS_TTL_SECONDS - 1, [("TCS", 3.0)]),
+                }
+                holdings_module._amfi_cache_dirty = True
+                with patch.dict(os.environ, {"VERCEL": ""}):
+                    await holdings_module.save_amfi_cache_async()
+
+                holdings_module._groww_holdings_cache = {}
+                holdings_module._load_amfi_cache()
+
+            self.assertEqual(list(holdings_module._groww_holdings_cache), ["120503"])
+            with patch("app.Code.holdings._get_groww_index", new=AsyncMock(side_effect=AssertionError)):
+                rows = await holdings_module._fetch_holdings_from_groww("120503", "Test Fund", _FailingAsyncClient())
+            self.assertEqual(rows, [("Infosys", 5.0)])
+        finally:
+            holdings_module._groww_holdings_cache = old_groww
+            holdings_module.AMFI_CACHE_FILE = old_file
+
+    async def test_amfi_cache_save_coalesces_overlapping_writes(self):
+        old_failed = holdings_module._failed_urls
+        old_file = holdings_module.AMFI_CACHE_FILE
+        writes = []
+        real_write = holdings_module._write_amfi_cache_file
+
+        def recording_write(payload):
+            writes.append(payload)
+            real_write(payload)
+
+        try:
+            with tempfile.TemporaryDirectory() as tmp_dir:
+                holdings_module.AMFI_CACHE_FILE = str(Path(tmp_dir) / "amfi_cache.json")
+                holdings_module._failed_urls = {"https://portal.amfiindia.com/spages/amfeb2024repo.xls"}
+                holdings_module._amfi_cache_dirty = True
+                with patch.dict(os.environ, {"VERCEL": ""}), patch(
+                    "app.Code.holdings._write_amfi_cache_file", side_effect=recording_write
+                ):
+                    await asyncio.gather(*[holdings_module.save_amfi_cache_async() for _ in range(5)])
+                    writes_after_burst = len(writes)
+                    # Nothing changed since the snapshot, so a later save does not touch the disk.
+                    await holdings_module.save_amfi_cache_async()
+
+                with open(holdings_module.AMFI_CACHE_FILE, "r", encoding="utf-8") as f:
+                    saved = json.load(f)
+
+            self.assertLessEqual(writes_after_burst, 2)
+            self.assertEqual(len(writes), writes_after_burst)
+            self.assertEqual(saved["failed"], ["https://portal.amfiindia.com/spages/amfeb2024repo.xls"])
+        finally:
+            holdings_module._failed_urls = old_failed
+            holdings_module.AMFI_CACHE_FILE = old_file
+
+    async def test_holdings_api_per_code_mode_fans_out_one_request_per_scheme(self):
+        class PerCodeClient:
+            def __init__(self):
+                self.calls = []
+                self.in_flight = 0
+                self.max_in_flight = 0
+
+            async def post(self, url, json=None, **kwargs):
+                self.calls.append(json["scheme_codes"])
+                self.in_flight += 1
+                self.max_in_flight = max(self.max_in_flight, self.in_flight)
+                await asyncio.sleep(0)
+                self.in_flight -= 1
+                code = json["scheme_codes"][0]
+                if code == "bad":
+                    return _FakeResponse(500, {})
+                return _FakeResponse(200, {code: [{"name": f"Stock {code}", "weight_pct": 4.5}]})
+
+        client = PerCodeClient()
+        with patch.dict(
+            os.environ, {"HOLDINGS_API_URL": "https://holdings.example/api", "HOLDINGS_API_MODE": "per_code"}
+        ), patch("app.Code.holdings._get_client", new=AsyncMock(return_value=client)), patch(
+            "app.Code.holdings.HOLDINGS_API_MAX_CONCURRENCY", 2
+        ), patch("app.Code.holdings.log_holdings") as log_mock:
+            result = await holdings_module._fetch_holdings_from_api(["101", "bad", "202"])
+
+        self.assertEqual(sorted(client.calls), [["101"], ["202"], ["bad"]])
+        self.assertEqual(client.max_in_flight, 2)
+        self.assertEqual(result, {"101": [("Stock 101", 4.5)], "202": [("Stock 202", 4.5)]})
+        log_mock.assert_called_once_with("Holdings API failed for 1 code(s): bad")
+
+    async def test_holdings_match_falls_back_to_longest_amfi_key_prefix(self):
+        full = {
+            "SBI BLUECHIP": [("Infosys", 5.0)],
+            "SBI BLUECHIP FUND": [("HDFC Bank", 6.0)],
+        }
+        with patch("app.Code.holdings._fetch_holdings_from_api", new=AsyncMock(return_value={})), patch(
+            "app.Code.holdings._fetch_amfi_monthly_file", new=AsyncMock(return_value=full)
+        ):
+            result = await holdings_module.get_holdings_for_schemes(
+                ["555"],
+                {"555": "SBI Bluechip Fund - Direct Plan - Growth"},
+            )
+
+        self.assertEqual(result["555"], [("HDFC Bank", 6.0)])
+
+    async def test_holdings_fuzzy_match_uses_first_containing_amfi_key(self):
+        full = {
+            "ALPHA LARGE CAP FUND REGULAR PLAN": [("Infosys", 5.0)],
+            "ALPHA LARGE CAP FUND DIRECT PLAN 120503": [("HDFC Bank", 6.0)],
+            "BETA FLEXI CAP FUND DIRECT PLAN": [("TCS", 7.0)],
+        }
+        with patch("app.Code.holdings._fetch_holdings_from_api", new=AsyncMock(return_value={})), patch(
+            "app.Code.holdings._fetch_amfi_monthly_file", new=AsyncMock(return_value=full)
+        ):
+            result = await holdings_module.get_holdings_for_schemes(
+                ["12050", "999"],
+                {"999": "Pha Large Cap Fund Direct"},
+            )
+
+        self.assertEqual(result["12050"], [("HDFC Bank", 6.0)])
+        self.assertEqual(result["999"], [("HDFC Bank", 6.0)])
+
+    def test_extract_next_data_json_reads_script_payload(self):
+        page = (
+            '<html><head><script src="/app.js"></script></head><body>'
+            '<script id="__NEXT_DATA__" type="application/json" crossorigin="">{"props": {"a": 1}}</script>'
+            "</body></html>"
+        )
+
+        self.assertEqual(holdings_module._extract_next_data_json(page), {"props": {"a": 1}})
+        self.assertIsNone(holdings_module._extract_next_data_json("<html><body>no data</body></html>"))
+        self.assertIsNone(holdings_module._extract_next_data_json('<script id="__NEXT_DATA__">{"a": 1}'))
+
+    async def test_groww_page_stream_stops_after_next_data_script(self):
+        page = (
+            "<html><head></head><body>"
+            '<script id="__NEXT_DATA__" type="application/json">{"props": {"a": 1}}</script>'
+            "<div>trailing markup</div></body></html>"
+        )
+        served = []
+
+        class StreamedPage:
+            async def aiter_text(self, chunk_size=None):
+                for i in range(0, len(page), 7):
+                    served.append(i)
+                    yield page[i : i + 7]
+
+        self.assertEqual(await holdings_module._stream_next_data_json(StreamedPage()), {"props": {"a": 1}})
+        self.assertLess(served[-1] + 7, len(page))
+
+    async def test_groww_fallback_uses_shared_client_with_groww_headers(self):
+        class RecordingClient:
+            def __init__(self):
+                self.headers = []
+
+            async def get(self, url, **kwargs):
+                self.headers.append(kwargs.get("headers"))
+                return _FakeResponse(500, {})
+
+        client = RecordingClient()
+        old_loaded = holdings_module._groww_index_loaded
+        try:
+            holdings_module._groww_index_loaded = False
+            with patch("app.Code.holdings._fetch_holdings_from_api", new=AsyncMock(return_value={})), patch(
+                "app.Code.holdings._fetch_amfi_monthly_file", new=AsyncMock(return_value={})
+            ), patch("app.Code.holdings._get_client", new=AsyncMock(return_value=client)):
+                result = await holdings_module.get_holdings_for_schemes(["777"], {"777": "Gamma Fund"})
+        finally:
+            holdings_module._groww_index_loaded = old_loaded
+
+        self.assertEqual(result, {})
+        self.assertEqual(client.headers, [holdings_module.GROWW_REQUEST_HEADERS])
+
+    async def test_groww_fallback_bounds_concurrent_fetches(self):
+        in_flight = 0
+        peak = 0
+        fetched_codes = []
+
+        async def slow_fetch(code, name, client):
+            nonlocal in_flight, peak
+            fetched_codes.append(code)
+            in_flight += 1
+            peak = max(peak, in_flight)
+            await asyncio.sleep(0.01)
+            in_flight -= 1
+            return [(f"Stock {code}", 1.0)]
+
+        codes = [str(100 + i) for i in range(holdings_module.GROWW_MAX_CONCURRENCY * 3)]
+        with patch("app.Code.holdings._fetch_holdings_from_api", new=AsyncMock(return_value={})), patch(
+            "app.Code.holdings._fetch_amfi_monthly_file", new=AsyncMock(return_value={})
+        ), patch("app.Code.holdings._get_client", new=AsyncMock(return_value=_FailingAsyncClient())), patch(
+            "app.Code.holdings._fetch_holdings_from_groww", new=slow_fetch
+        ):
+            result = await holdings_module.get_holdings_for_schemes(codes + [f" {codes[0]} ", codes[1]])
+
+        self.assertEqual(len(result), len(codes))
+        self.assertEqual(sorted(fetched_codes), sorted(codes))
+        self.assertLessEqual(peak, holdings_module.GROWW_MAX_CONCURRENCY)
+
     async def test_pdf_upload_parser_times_out_without_blocking_event_loop(self):
         def slow_parse(*_args, **_kwargs):
             time.sleep(0.1)
@@ -2757,8 +3382,8 @@ class TestParserAndHoldingsResilience(unittest.IsolatedAsyncioTestCase):
             ]
         }
 
-        workbook_bytes = convert_to_excel(payload)
-        workbook = load_workbook(workbook_bytes)
+        with convert_to_excel(payload) as workbook_bytes:
+            workbook = load_workbook(workbook_bytes)
         sheet = workbook.active
 
         self.assertEqual(sheet["A2"].value, "'=AMC")
@@ -2773,20 +3398,19 @@ class TestParserAndHoldingsResilience(unittest.IsolatedAsyncioTestCase):
         self.assertEqual(sheet["K4"].value, "'\nTYPE")
 
     def test_convert_to_excel_skips_malformed_rows_without_crashing(self):
-        workbook_bytes = convert_to_excel(
-            {
-                "folios": [
-                    "bad folio",
-                    {
-                        "schemes": [
-                            "bad scheme",
-                            {"transactions": ["bad transaction"]},
-                        ],
-                    },
-                ]
-            }
-        )
-        workbook = load_workbook(workbook_bytes)
+        payload = {
+            "folios": [
+                "bad folio",
+                {
+                    "schemes": [
+                        "bad scheme",
+                        {"transactions": ["bad transaction"]},
+                    ],
+                },
+            ]
+        }
+        with convert_to_excel(payload) as workbook_bytes:
+            workbook = load_workbook(workbook_bytes)
         sheet = workbook.active
 
         self.assertEqual(sheet["A2"].value, "No transactions found")